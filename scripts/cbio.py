@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+import xmlrpc.client
+from device import Device, Sampler
+import numpy as np
+
+'''
+XML-RPC library for controlling OnRobot devcies from Doosan robots
+
+Global_cbip holds the IP address of the compute box, needs to be defined by the end user
+'''
+
+# Connection
+CONN_ERR = -2   # Connection failure
+RET_OK = 0      # Okay
+RET_FAIL = -1   # Error
+
+#Number of ComputeBox digital inputs
+CBIO_INPUTS = 8
+
+#Edge selection for input monitor callbacks
+IO_RISING = 1
+IO_FALLING = 2
+IO_BOTH = IO_RISING | IO_FALLING
+
+#Number of WebLogic variables (0-15)
+WEBLOGIC_VARS = 16
+#First WebLogic variable holding the monitor_io falling edge flags of inputs 1-8
+WEBLOGIC_MONITOR_VAR = 8
+
+#Bit of each input in the cb_get_digital_inputs bitmask
+IO_BITS = 1 << np.arange(CBIO_INPUTS)
+
+#Cartesian pose keys of cb_send_pose and of EYES
+CART_KEYS = ('x', 'y', 'z', 'r1', 'r2', 'r3')
+EYES_POSE_KEYS = ('x', 'y', 'z', 'rx', 'ry', 'rz')
+
+
+class CBIO():
+    '''
+    This class if for driving Compuetbox IO through a dedicated Weblogic program
+    '''
+    cb = None
+
+    def __init__(self, dev, get_pose=None, get_joints=None):
+        '''
+        @param dev: Device object
+        @param get_pose: Returns with the current robot pose as [x, y, z, rx, ry, rz],
+        e.g. lambda: get_current_posx()[0] on a Doosan controller
+        @param get_joints: Returns with the current joint angles, e.g. get_current_posj
+        '''
+        self.cb = dev.getCB()
+        self.get_pose = get_pose
+        self.get_joints = get_joints
+        #Running IOMonitor that get_io reads the inputs from, None reads them from the ComputeBox
+        self.monitor = None
+
+    def get_io(self, io_id):
+        '''
+        Gets the state of the given input id\n
+        If an IOMonitor is set in self.monitor its latest sample is used
+
+        @type io_id: int
+        @param io_id: Id of the input we want to check (1-8)
+        @rtype: bool
+        @return: True if INPUT is HIGH, False INPUT is LOW
+        '''
+
+        #Sanity check
+        if io_id > 8 or io_id < 1:
+            print("Invalid io_id given, 1-8 valid only")
+            return False
+
+        iostate = None
+        if self.monitor is not None:
+            iostate = self.monitor.latest()
+        if iostate is None:
+            iostate = self.cb.cb_get_digital_inputs()
+        if iostate == -1:
+            print("Failed to get digital input state from computebox")
+            return False
+
+        if ((iostate & (1 <<(io_id-1))) != 0):
+            return True
+        else:
+            return False
+
+    def get_weblogic_var(self, var_id):
+        '''
+        Gets the value of the given WebLogic variable id
+
+        @type var_id: int
+        @param var_id: Id of the WebLogic variable (0-15)
+        @rtype: int
+        @return: Value of the variable
+        '''
+        #Sanity check
+        if var_id > 15 or var_id < 1:
+            print("Invalid var_id given, 1-15 valid only")
+            return RET_FAIL
+
+        return self.cb.cb_get_weblogic_variable(int(var_id))
+
+    def set_weblogic_var(self, var_id, value):
+        '''
+        Sets the value of the given WebLogic variable id
+
+        @type var_id: int
+        @param var_id: Id of the WebLogic variable (0-15)
+        @type value: int
+        @param value: The value we want to write into the variable
+        '''
+        #Sanity check
+        if var_id > 15 or var_id < 1:
+            print("Invalid var_id given, 1-15 valid only")
+            return RET_FAIL
+
+        if value > 32767 or value < -32768:
+            print("Invalid value given, -32768-32767 valid only")
+            return RET_FAIL
+
+        return self.cb.cb_set_weblogic_variable(int(var_id), int(value))
+
+    def get_weblogic_vars(self, first=0, count=WEBLOGIC_VARS):
+        '''
+        Gets a range of WebLogic variables in one batched round trip
+
+        @type first: int
+        @param first: Id of the first WebLogic variable (0-15)
+        @type count: int
+        @param count: Number of variables to read
+        @rtype: numpy.ndarray
+        @return: Values of the variables first..first+count-1
+        '''
+        #Sanity check
+        if first < 0 or count < 1 or first + count > WEBLOGIC_VARS:
+            print("Invalid WebLogic variable range given, 0-15 valid only")
+            return RET_FAIL
+
+        multi = xmlrpc.client.MultiCall(self.cb)
+        for var_id in range(first, first + count):
+            multi.cb_get_weblogic_variable(var_id)
+        return np.fromiter(multi(), dtype=int, count=count)
+
+    def set_weblogic_vars(self, first, values):
+        '''
+        Sets a range of WebLogic variables in one batched round trip
+
+        @type first: int
+        @param first: Id of the first WebLogic variable (0-15)
+        @param values: Values to write into the variables first..first+len(values)-1
+        @rtype: list
+        @return: Results of the writes
+        '''
+        values = np.asarray(values, dtype=int).ravel()
+        #Sanity check
+        if first < 0 or len(values) < 1 or first + len(values) > WEBLOGIC_VARS:
+            print("Invalid WebLogic variable range given, 0-15 valid only")
+            return RET_FAIL
+
+        if (values > 32767).any() or (values < -32768).any():
+            print("Invalid value given, -32768-32767 valid only")
+            return RET_FAIL
+
+        multi = xmlrpc.client.MultiCall(self.cb)
+        for var_id, value in enumerate(values.tolist(), first):
+            multi.cb_set_weblogic_variable(var_id, value)
+        return list(multi())
+
+    def start_weblogic_prog(self, prog_id):
+        '''
+        Starts the given weblogic program
+
+        @type prog_id: int
+        @param prog_id: Id of the WebLogic program (0-9999)
+        '''
+        return self.cb.cb_weblogic_run(prog_id)
+
+    def stop_weblogic_prog(self):
+        '''
+        Stop the currently running WebLogic program
+        '''
+        return self.cb.cb_weblogic_stop()
+
+    def set_io(self, io_id, iostate):
+        '''
+        Sets the state of a Computebox output
+        (A dedicated Weblogic program is required to operate)
+
+        @type io_id: int
+        @param io_id: Id of the input we want to set (1-8)
+        @type iostate: bool
+        @param iostate: True - set OUTPUT HIGH, False set OUTPUT LOW
+        '''
+        #Sanity check
+        if io_id > 8 or io_id < 1:
+            print("Invalid io_id given, 1-8 valid only")
+            return RET_FAIL
+
+        if (type(iostate) != bool):
+            print("Invalid iostate given, boolean is valid only")
+            return RET_FAIL
+
+        #Set IO through WebLogic
+        self.cb.cb_set_weblogic_variable(int(io_id-1), int(iostate))
+
+    def monitor_io(self, io_id):
+        '''
+        Checks if the given io had a falling edge (pallett removed)
+        (A dedicated Weblogic program is required to operate)
+
+        @type io_id: int
+        @param io_id: Id of the input we want to set (1-8)
+        @rtype: int
+        @return: -1 - Error, 1 Input had a falling edge, 0 Input is still 0
+        '''
+        #Sanity check
+        if io_id > 8 or io_id < 1:
+            print("Invalid io_id given, 1-8 valid only")
+            return RET_FAIL
+
+        ioval = self.cb.cb_get_weblogic_variable(int(io_id+7))
+
+        if ioval > 0:
+            return 1
+        elif ioval == 0:
+            return 0
+        else:
+            return -1
+
+    def monitor_ios(self):
+        '''
+        Checks all inputs for a falling edge (pallett removed) in one batched round trip
+        (A dedicated Weblogic program is required to operate)
+
+        @rtype: numpy.ndarray
+        @return: Per input (index io_id - 1) -1 - Error, 1 Input had a falling edge, 0 Input is still 0
+        '''
+        iovals = self.get_weblogic_vars(WEBLOGIC_MONITOR_VAR, CBIO_INPUTS)
+        return np.sign(iovals)
+
+    def sendpose(self):
+        '''
+        Sends our current pose (cartesian and joint) to the CB
+        '''
+        if self.get_pose is None or self.get_joints is None:
+            print("No robot pose source for CBIO, get_pose and get_joints are required")
+            return RET_FAIL
+
+        #Get current position from the robot
+        curr_pos = self.get_pose()
+        #Convert pose to a dictionary for sending on XML-rpc
+        cart_dict = dict(zip(CART_KEYS, (float(v) for v in curr_pos[:6])))
+        #Convert joint angles to list so it can be sent over xml-rpc
+        joint_list = [float(j) for j in self.get_joints()[:6]]
+
+        self.cb.cb_send_pose(cart_dict, joint_list)
+
+
+class IOMonitor(Sampler):
+    '''
+    This class samples the ComputeBox digital inputs in the background and tracks
+    the rising and falling edges of all inputs\n
+    Edge times are time.perf_counter() values, indexed with io_id - 1
+    '''
+
+    def __init__(self, dev, period=0.01):
+        '''
+        @param dev: Device object
+        @param period: Sampling period in seconds
+        @type period: float
+        '''
+        Sampler.__init__(self, period)
+        self.cbio = CBIO(dev)
+        self.subscribers = []
+        self.rise_time = np.full(CBIO_INPUTS, np.nan)
+        self.fall_time = np.full(CBIO_INPUTS, np.nan)
+        self.rise_count = np.zeros(CBIO_INPUTS, dtype=int)
+        self.fall_count = np.zeros(CBIO_INPUTS, dtype=int)
+        #Latest (bitmask, sample time), replaced as a whole so readers never see a torn sample
+        self._latest = None
+
+    def subscribe(self, callback, io_id=None, edge=IO_BOTH):
+        '''
+        Registers a callback, called with (io_id, rising, time) from the monitor thread on every edge
+
+        @param io_id: Input to watch (1-8), None watches all of them
+        @param edge: IO_RISING, IO_FALLING or IO_BOTH
+        '''
+        mask = 0xFF if io_id is None else 1 << (io_id - 1)
+        self.subscribers.append((mask, edge, callback))
+
+    def latest(self, max_age=None):
+        '''
+        Returns with the latest input bitmask
+
+        @param max_age: Maximum age of the sample in seconds, 3 sampling periods if None
+        @return: Input bitmask, None if there is no sample young enough
+        @rtype: int
+        '''
+        latest = self._latest
+        if max_age is None:
+            max_age = 3 * self.period
+        if latest is None or time.perf_counter() - latest[1] > max_age:
+            return None
+        return latest[0]
+
+    def sample(self):
+        '''
+        Reads the input bitmask, updates the edge tracking and dispatches the callbacks
+
+        @return: Input bitmask, -1 if the ComputeBox failed to read it
+        @rtype: int
+        '''
+        iostate = self.cbio.cb.cb_get_digital_inputs()
+        now = time.perf_counter()
+        if iostate == -1:
+            return iostate
+        prev = self._latest
+        self._latest = (iostate, now)
+        if prev is None:
+            return iostate
+
+        changed = prev[0] ^ iostate
+        if changed == 0:
+            return iostate
+        rising = (changed & iostate & IO_BITS) != 0
+        falling = (changed & ~iostate & IO_BITS) != 0
+        self.rise_time[rising] = now
+        self.fall_time[falling] = now
+        self.rise_count += rising
+        self.fall_count += falling
+
+        for i in np.flatnonzero(changed & IO_BITS):
+            edge = IO_RISING if rising[i] else IO_FALLING
+            for mask, sel, callback in self.subscribers:
+                if mask & (1 << i) and sel & edge:
+                    callback(int(i) + 1, bool(rising[i]), now)
+        return iostate
+
+    def start(self):
+        '''
+        Starts sampling in a background thread, the first sample is the reference for the edges
+        '''
+        if self.isRunning():
+            return RET_FAIL
+        self._latest = None
+        if self.sample() == -1:
+            print("Failed to get digital input state from computebox")
+            return RET_FAIL
+        self._start()
+        return RET_OK
+
+
+class PoseFeed(Sampler):
+    '''
+    This class pushes the current robot pose (cartesian and joint) to the CB at a fixed rate
+    in the background, in place of calling CBIO.sendpose from the robot program\n
+    The sent dictionary and list are reused, only changed fields are updated and nothing
+    is sent while the robot stands still, except a keepalive\n
+    Set it as EYES.pose_feed to take the EYES poses from the feed while the robot stands still
+    '''
+
+    def __init__(self, dev, get_pose, get_joints, period=0.05, keepalive=1.0):
+        '''
+        @param dev: Device object
+        @param get_pose: Returns with the current robot pose as [x, y, z, rx, ry, rz]
+        @param get_joints: Returns with the current joint angles
+        @param period: Sampling period in seconds
+        @type period: float
+        @param keepalive: Resend period of an unchanged pose in seconds
+        @type keepalive: float
+        '''
+        Sampler.__init__(self, period)
+        self.cbio = CBIO(dev, get_pose, get_joints)
+        self.keepalive = float(keepalive)
+        self.sent = 0
+        self._cart = dict.fromkeys(CART_KEYS, 0.0)
+        self._joints = [0.0] * 6
+        self._sample_time = None
+        self._change_time = None
+        self._send_time = None
+        self._lock = threading.Lock()
+
+    def sample(self):
+        '''
+        Reads the robot pose and sends it to the CB if it changed or the keepalive elapsed
+
+        @return: True if the pose was sent
+        @rtype: bool
+        '''
+        pose = self.cbio.get_pose()
+        joints = self.cbio.get_joints()
+        now = time.perf_counter()
+        changed = False
+        with self._lock:
+            for key, val in zip(CART_KEYS, pose[:6]):
+                val = float(val)
+                if self._cart[key] != val:
+                    self._cart[key] = val
+                    changed = True
+            for i, val in enumerate(joints[:6]):
+                val = float(val)
+                if self._joints[i] != val:
+                    self._joints[i] = val
+                    changed = True
+            if changed or self._change_time is None:
+                self._change_time = now
+            self._sample_time = now
+
+        #Only this thread writes the dict and list, so they can be sent without the lock
+        if changed or self._send_time is None or now - self._send_time > self.keepalive:
+            self.cbio.cb.cb_send_pose(self._cart, self._joints)
+            self._send_time = now
+            self.sent += 1
+            return True
+        return False
+
+    def latest(self, max_age=None):
+        '''
+        Returns with the latest sampled pose
+
+        @param max_age: Maximum age of the sample in seconds, 3 sampling periods if None
+        @return: (pose, joints) lists, None if there is no sample young enough
+        @rtype: tuple
+        '''
+        if max_age is None:
+            max_age = 3 * self.period
+        with self._lock:
+            if self._sample_time is None or time.perf_counter() - self._sample_time > max_age:
+                return None
+            return [self._cart[k] for k in CART_KEYS], list(self._joints)
+
+    def eyes_pose(self, max_age=None):
+        '''
+        Returns with the latest sampled pose as an EYES pose dictionary\n
+        The pose is only returned while the robot stands still, i.e. the latest sample is
+        young enough and did not change since the one before, so it is the current pose
+
+        @param max_age: Maximum age of the sample in seconds, 1 sampling period if None
+        @return: Pose dictionary, None if there is no such sample
+        @rtype: dict
+        '''
+        if max_age is None:
+            max_age = self.period
+        with self._lock:
+            if self._sample_time is None or time.perf_counter() - self._sample_time > max_age:
+                return None
+            if self._change_time >= self._sample_time:
+                return None
+            return {k: self._cart[c] for k, c in zip(EYES_POSE_KEYS, CART_KEYS)}
+
+    def start(self):
+        '''
+        Starts the pose feed thread
+        '''
+        if self.isRunning():
+            return RET_FAIL
+        if self.cbio.get_pose is None or self.cbio.get_joints is None:
+            print("No robot pose source for PoseFeed, get_pose and get_joints are required")
+            return RET_FAIL
+        self._send_time = None
+        self._start()
+        return RET_OK
+
+
+if __name__ == '__main__':
+    device = Device()
+    cbio = CBIO(device)
+    print("Input 1: ", cbio.get_io(1))
@@ -1,7 +1,128 @@
 #!/usr/bin/env python3
 
+import time
+import threading
 import xmlrpc.client
 
+#Set to abort every wait of the library that is in progress, e.g. by the LIFT ESTOP watchdog
+abort_event = threading.Event()
+
+
+def wait(sec):
+    '''
+    Sleeps for the given time, returns early if an abort is signalled
+
+    @param sec: Time to sleep in seconds
+    @type sec: float
+    @return: True if aborted, False otherwise
+    @rtype: bool
+    '''
+    return abort_event.wait(sec)
+
+
+def read_batch(multi, name):
+    '''
+    Runs a batched read whose first call is the connection check of the device\n
+    The getters of a missing device fault instead of returning, so the connection check
+    is evaluated first and a fault of any other call is reported as a connection failure
+
+    @param multi: xmlrpc.client.MultiCall, the first call is the connection check
+    @param name: Name of the device in the error messages
+    @type name: str
+    @return: Results of the calls after the connection check, None if the device is not connected
+    @rtype: list
+    '''
+    res = multi()
+    if not res[0]:
+        print("No " + name + " connected")
+        return None
+    try:
+        return list(res)[1:]
+    except xmlrpc.client.Fault as e:
+        print("Failed to read " + name + ": " + str(e.faultString))
+        return None
+
+
+class Sampler:
+    '''
+    Base of the background monitors, calls sample() at a fixed rate\n
+    A monitor opens its own ComputeBox connection, a ServerProxy must not be shared between threads.
+    An exception of a sample is counted in errors and kept in last_error, the sampling goes on
+    '''
+    #Stop the sampling when the library wide abort is signalled or not?
+    abortable = False
+
+    def __init__(self, period):
+        '''
+        @param period: Sampling period in seconds
+        @type period: float
+        '''
+        self.period = float(period)
+        self.errors = 0
+        self.last_error = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def sample(self):
+        '''
+        Takes one sample, implemented by the monitors
+        '''
+        raise NotImplementedError
+
+    #Private method, one tick of the loop, returns True to end the loop
+    def _tick(self):
+        self.sample()
+        return False
+
+    #Private method, runs the ticks at a fixed rate
+    #Returns with True if a tick ended the loop, False on timeout, stop or abort
+    def _loop(self, timeout=None):
+        start = next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                if self._tick():
+                    return True
+            except Exception as e:
+                if self.errors == 0:
+                    print(type(self).__name__ + " sample failed: " + str(e))
+                self.errors += 1
+                self.last_error = e
+            next_tick += self.period
+            if timeout is not None and next_tick - start > timeout:
+                return False
+            delay = next_tick - time.perf_counter()
+            if delay <= 0:
+                next_tick = time.perf_counter()
+            if self._stop.wait(max(delay, 0)):
+                return False
+            if self.abortable and abort_event.is_set():
+                return False
+        return False
+
+    def isRunning(self):
+        '''
+        Returns with True if the background thread is running
+
+        @rtype: bool
+        '''
+        return self._thread is not None and self._thread.is_alive()
+
+    #Private method, starts target (the loop by default) in a daemon thread
+    def _start(self, target=None, *args):
+        self._stop.clear()
+        self._thread = threading.Thread(target=target or self._loop, args=args, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''
+        Stops the background thread
+        '''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
 class Device:
     '''
     Generic device object
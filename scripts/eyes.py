@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import queue
+import threading
+import xmlrpc.client
+from device import Device, read_batch, wait
+import numpy as np
+
+'''
+XML-RPC library for controlling OnRobot devcies from Doosan robots
+
+Global_cbip holds the IP address of the compute box, needs to be defined by the end user
+'''
+
+#Robot ID reported to the EYES system
+EYES_DOOSAN_ID = 8
+
+# Connection
+CONN_ERR = -2   # Connection failure
+RET_OK = 0      # Okay
+RET_FAIL = -1   # Error
+
+#Pose dictionary keys used over XML-RPC
+POSE_KEYS = ('x', 'y', 'z', 'rx', 'ry', 'rz')
+
+#Columns of a bulk workpiece fetch, the pose followed by model type and inspection match
+EYES_WP_COLUMNS = POSE_KEYS + ('type', 'match')
+
+#Keys of an inspection result and the XML-RPC getters behind them
+EYES_INSPECTION_KEYS = ('count', 'type', 'result', 'match')
+EYES_INSPECTION_CALLS = ('eye_get_workpiece_count', 'eye_get_workpiece_type',
+                         'eye_get_workpiece_inspection_eval',
+                         'eye_get_workpiece_inspection_match_percentage')
+
+
+class EYES():
+    '''
+    This calss is for communicating with the EYES system\n
+    Poses are [x, y, z, rx, ry, rz] lists in the robot base coordinate system
+    '''
+    cb = None
+
+    def __init__(self, dev, get_pose=None, cam_cache=None):
+        '''
+        @param dev: Device object
+        @param get_pose: Returns with the current robot pose as [x, y, z, rx, ry, rz],
+        e.g. lambda: get_current_posx()[0] on a Doosan controller
+        @param cam_cache: JSON file to persist the camera view pose cache in, None keeps it in memory only
+        '''
+        self.cb = dev.getCB()
+        self.get_pose = get_pose
+        #Running cbio.PoseFeed the current pose is taken from while the robot stands still
+        self.pose_feed = None
+        #Camera view poses per task ID, filled by get_cam_pos
+        self.cam_cache = cam_cache
+        self._cam_poses = {}
+        if cam_cache is not None and os.path.exists(cam_cache):
+            #A broken cache file only costs reading the poses from EYES again
+            try:
+                with open(cam_cache) as f:
+                    self._cam_poses = {int(k): v for k, v in json.load(f).items()}
+            except (OSError, ValueError, AttributeError) as e:
+                print("Failed to load the EYES camera view pose cache, starting empty: " + str(e))
+                self._cam_poses = {}
+
+    def isConnected(self):
+        '''
+        Returns with True if an EYE system is connected, False otherwise
+
+        @return: True if connected, False otherwise
+        @rtype: bool
+        '''
+        conn = self.cb.eye_is_connected()
+        if conn:
+            return True
+        else:
+            print("EYES system is not connected")
+            return False
+
+    #Returns with the robots current position in a format that can be sent over XML-RPC
+    #Returns with None if there is no pose source
+    #The feed is skipped with use_feed=False where the pose is stored, not only used for one image
+    def _get_curr_pose_dict(self, use_feed=True):
+        #Take the pose from the feed while it is the current one
+        if use_feed and self.pose_feed is not None:
+            pose_dict = self.pose_feed.eyes_pose()
+            if pose_dict is not None:
+                return pose_dict
+        if self.get_pose is None:
+            print("No robot pose source for EYES, get_pose is required")
+            return None
+        #Get current position from the robot
+        curr_pos = self.get_pose()
+        #Convert pose to a dictionary for sending on XML-rpc
+        return dict(zip(POSE_KEYS, (float(v) for v in curr_pos[:6])))
+
+    #Convert an XML-RPC struct into a robot pose
+    def _dict_to_pose(self, pose_d):
+        return [pose_d[k] for k in POSE_KEYS]
+
+    #Check if pose is zero
+    #Arg1 pose dict
+    #Retval Boolean
+    def _check_zero_pose(self, pose):
+        return all(pose[k] == 0.0 for k in POSE_KEYS)
+
+    #Inspect + locate
+    def locate(self, task_id, validate=True):
+        '''
+        Runs the given EYES locate task and returns with the number of workpieces found
+
+        @param task_id: The id of EYES task defined in the web client
+        @type task_id: int
+        @param validate: Validate the return value or not?
+        @type validate: bool
+        @return: Number of workpieces found
+        @rtype: int
+        '''
+        #Run process
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        pose_struct = self._get_curr_pose_dict()
+        if pose_struct is None:
+            return RET_FAIL
+
+        return self._run_process(task_id, pose_struct, validate)
+
+    #Private method, runs a task with the pose the image is taken from
+    def _run_process(self, task_id, pose_struct, validate):
+        #Run task
+        retval = self.cb.eye_run_process(int(task_id), pose_struct, EYES_DOOSAN_ID)
+
+        if (retval == -1):
+            retval = 0 #Zero objects found
+
+        if validate is True:
+            if (retval == 0):
+                print("No workpiece found while running EYES task: " + str(task_id))
+
+        return retval
+
+    def inspect(self, task_id, validate=True):
+        '''
+        Runs the given EYES inspect task and returns with the number of workpieces found
+
+        @param task_id: The id of EYES task defined in the web client
+        @type task_id: int
+        @param validate: Validate the return value or not?
+        @type validate: bool
+        @return: Number of workpieces found
+        @rtype: int
+        '''
+        return self.locate(task_id, validate)
+
+    #Get valid object (get next workpiece from eyes queue)
+    def get_object(self, gripper_sel, mod_type):
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        if gripper_sel not in [0,1,2]:
+            print("Invalid gripper type parameter for EYES, 0,1,2 is valid only")
+            return RET_FAIL
+
+        #Get position from EYES
+        pose_dict = self.cb.eye_get_valid_object(gripper_sel, mod_type)
+
+        if self._check_zero_pose(pose_dict) is True:
+            print("Got invalid position during inspect or locate")
+            return RET_FAIL
+
+        #Convert position into robot position
+        return self._dict_to_pose(pose_dict)
+
+    def get_next_wp(self, gripper_sel, model_type):
+        '''
+        Gets the next workpiece's position must be run after inspect or locate
+
+        @return: The position of the next workpiece that was found in robot coordinate system
+        @rtype: list
+        '''
+        return self.get_object(gripper_sel, model_type)
+
+    def get_objects(self, gripper_sel, mod_type, count=None):
+        '''
+        Drains the found workpieces with one batched round trip, must be run after inspect or locate\n
+        Each workpiece is read together with its model type and inspection match,
+        workpieces with a zero pose are dropped
+
+        @param count: Number of workpieces to fetch, the remaining workpiece count if None
+        @type count: int
+        @return: Array of workpieces, columns are EYES_WP_COLUMNS
+        @rtype: numpy.ndarray
+        '''
+        if gripper_sel not in [0,1,2]:
+            print("Invalid gripper type parameter for EYES, 0,1,2 is valid only")
+            return RET_FAIL
+
+        multi = xmlrpc.client.MultiCall(self.cb)
+        multi.eye_is_connected()
+        if count is None:
+            multi.eye_get_workpiece_count()
+        res = read_batch(multi, "EYES system")
+        if res is None:
+            return CONN_ERR
+        if count is None:
+            count = res[0]
+        try:
+            return self._fetch_objects(gripper_sel, mod_type, count)
+        except xmlrpc.client.Fault as e:
+            print("Failed to fetch workpieces from EYES: " + str(e.faultString))
+            return CONN_ERR
+
+    #Private method, reads count workpieces without the connection check
+    def _fetch_objects(self, gripper_sel, mod_type, count):
+        count = max(int(count), 0)
+        multi = xmlrpc.client.MultiCall(self.cb)
+        for _ in range(count):
+            multi.eye_get_valid_object(gripper_sel, mod_type)
+            multi.eye_get_workpiece_type()
+            multi.eye_get_workpiece_inspection_match_percentage()
+        res = tuple(multi()) if count else ()
+
+        wps = np.empty((count, len(EYES_WP_COLUMNS)))
+        for i in range(count):
+            pose_dict, wp_type, match = res[3 * i:3 * i + 3]
+            wps[i, :6] = [pose_dict[k] for k in POSE_KEYS]
+            wps[i, 6] = wp_type
+            wps[i, 7] = match
+        return wps[(wps[:, :6] != 0.0).any(axis=1)]
+
+    #Calibrate (only used for external mount)
+    def ext_calib(self):
+        '''
+        Send the current position to the EYES system for external camera mount calibration
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        pose_struct = self._get_curr_pose_dict(use_feed=False)
+        if pose_struct is None:
+            return RET_FAIL
+
+        self.cb.eye_calibrate(pose_struct, EYES_DOOSAN_ID)
+        self.clear_cam_cache()
+
+    #Get the remaining workpiece count
+    def get_wp_count(self):
+        '''
+        Returns with the number of workpieces left, must be run after inspect or locate
+
+        @return: Number of workpieces left
+        @rtype: int
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.eye_get_workpiece_count()
+
+    #Get the workpiece type
+    def get_wp_type(self):
+        '''
+        Returns with the model type of the found workpiece
+
+        @return: Model type of the workpiece
+        @rtype: int
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.eye_get_workpiece_type()
+
+    #Get the inspection result (0 invalid, 1 pass, 2 fail, -1 error)
+    def get_insp_res(self):
+        '''
+        Returns with the result of the inspection task\n
+        0 means invalid\n
+        1 means pass\n
+        2 means fail\n
+        -1 means error during inspection\n
+
+        @return: Inspection result
+        @rtype: int
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.eye_get_workpiece_inspection_eval()
+
+    #Get the inspection match  (0-100%, -1 error)
+    def get_insp_match(self):
+        '''
+        Returns with the match percentage of the inspecton\n
+        0-100% inspection match\n
+        -1 error during inspection
+
+
+        @return: Number of workpieces found
+        @rtype: int
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.eye_get_workpiece_inspection_match_percentage()
+
+    def inspection_result(self):
+        '''
+        Returns with the workpiece count, model type, inspection result and match
+        in one batched round trip, must be run after inspect\n
+        The dictionary is indexed with EYES_INSPECTION_KEYS, see get_wp_count,
+        get_wp_type, get_insp_res and get_insp_match for the values
+
+        @return: Inspection result dictionary
+        @rtype: dict
+        '''
+        multi = xmlrpc.client.MultiCall(self.cb)
+        multi.eye_is_connected()
+        for call in EYES_INSPECTION_CALLS:
+            getattr(multi, call)()
+        res = read_batch(multi, "EYES system")
+        if res is None:
+            return CONN_ERR
+        return dict(zip(EYES_INSPECTION_KEYS, res))
+
+    #Returns with the landmarks position in robot pose
+    def get_landmark(self):
+        '''
+        Returns with the landmarks position in the robots coordinate system
+
+        @return: Landmarks position
+        @rtype: list
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        pose_struct = self._get_curr_pose_dict()
+        if pose_struct is None:
+            return RET_FAIL
+
+        landmark_dict = self.cb.eye_landmark_orig(pose_struct, EYES_DOOSAN_ID)
+
+        if self._check_zero_pose(landmark_dict) is True:
+            print("Got invalid position during landmark query")
+            return RET_FAIL
+
+        return self._dict_to_pose(landmark_dict)
+
+    #Save camera view pose into the EYES system
+    def set_cam_pos(self):
+        '''
+        Saves the current robot position in the camera
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        pose_struct = self._get_curr_pose_dict(use_feed=False)
+        if pose_struct is None:
+            return RET_FAIL
+
+        res = self.cb.eye_set_cameraview_pose(pose_struct, EYES_DOOSAN_ID)
+        #The pose is saved for the task active in EYES, which is not known here
+        self.clear_cam_cache()
+
+        if not res:
+            print("Failed to set camera view pose in EYES")
+            return RET_FAIL
+        else:
+            return RET_OK
+
+    #Get already saved camera position based on task ID
+    #Returns with robot pose
+    def get_cam_pos(self, t_ID):
+        '''
+        Gets the previously saved camera postion in robot coordinate\n
+        Poses are cached per task until set_cam_pos or ext_calib is called
+
+        @param t_ID: Task ID of the EYES system where the position was saved
+        @rtype: list
+        @return: Camera view position in robot coordinate system
+        '''
+        pose = self._cam_poses.get(int(t_ID))
+        if pose is not None:
+            return list(pose)
+
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        pose_dict = self.cb.eye_get_cameraview_pose(t_ID, EYES_DOOSAN_ID)
+
+        if self._check_zero_pose(pose_dict) is True:
+            print("Got invalid position as camera pose")
+            return RET_FAIL
+
+        pose = self._dict_to_pose(pose_dict)
+        self._cam_poses[int(t_ID)] = pose
+        self._save_cam_cache()
+        return list(pose)
+
+    def clear_cam_cache(self):
+        '''
+        Drops the cached camera view poses, the next get_cam_pos reads them from EYES again
+        '''
+        self._cam_poses = {}
+        self._save_cam_cache()
+
+    #Private method, writes the camera view pose cache to its file if there is one
+    #The file is replaced as a whole, an interrupted write leaves the previous cache in place
+    def _save_cam_cache(self):
+        if self.cam_cache is None:
+            return
+        tmp = self.cam_cache + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self._cam_poses, f)
+            os.replace(tmp, self.cam_cache)
+        except OSError as e:
+            print("Failed to save the EYES camera view pose cache: " + str(e))
+
+
+class LocatePipeline():
+    '''
+    This class runs EYES locate tasks in the background and queues the found workpieces\n
+    The robot triggers the next locate as soon as it has left the camera view, and
+    get_next_wp serves the workpieces of previous locates from the queue
+    '''
+
+    def __init__(self, dev, get_pose, task_id, gripper_sel=0, mod_type=0):
+        '''
+        @param dev: Device object, the pipeline opens its own ComputeBox connection
+        @param get_pose: Returns with the current robot pose as [x, y, z, rx, ry, rz]
+        @param task_id: The id of EYES task defined in the web client
+        @type task_id: int
+        @param gripper_sel: Gripper selection for eye_get_valid_object (0, 1, 2)
+        @param mod_type: Model type for eye_get_valid_object
+        '''
+        self.eyes = EYES(dev, get_pose)
+        self.task_id = task_id
+        self.gripper_sel = gripper_sel
+        self.mod_type = mod_type
+        #Durations of the locates in seconds, for checking that they stay hidden behind the motion
+        self.locate_times = []
+        #Exception of the last failed background locate
+        self.last_error = None
+
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._busy = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            pose_struct = self._requests.get()
+            if pose_struct is None:
+                return
+            start = time.perf_counter()
+            try:
+                found = self.eyes._run_process(self.task_id, pose_struct, False)
+                wps = self.eyes._fetch_objects(self.gripper_sel, self.mod_type, found)
+                for pose in wps[:, :6].tolist():
+                    self._results.put(pose)
+                self.locate_times.append(time.perf_counter() - start)
+            except Exception as e:
+                #Queued as a marker so that get_next_wp reports the failure in order
+                self.last_error = e
+                self._results.put(RET_FAIL)
+            finally:
+                self._busy.clear()
+
+    def trigger(self):
+        '''
+        Starts the next locate with the current robot pose, call it as soon as the camera view is free\n
+        The pose is taken on the calling thread so it matches the image even if the robot moves on
+
+        @return: RET_OK if started, RET_FAIL if a locate is still running
+        '''
+        if self._busy.is_set():
+            return RET_FAIL
+        if self.gripper_sel not in [0,1,2]:
+            print("Invalid gripper type parameter for EYES, 0,1,2 is valid only")
+            return RET_FAIL
+        pose_struct = self.eyes._get_curr_pose_dict()
+        if pose_struct is None:
+            return RET_FAIL
+        self._busy.set()
+        self._requests.put(pose_struct)
+        return RET_OK
+
+    def isBusy(self):
+        '''
+        Returns with True if a locate is running in the background
+
+        @rtype: bool
+        '''
+        return self._busy.is_set()
+
+    def pending(self):
+        '''
+        Returns with the number of queued workpieces
+
+        @rtype: int
+        '''
+        return self._results.qsize()
+
+    def get_next_wp(self, timeout=10.0):
+        '''
+        Returns with the next queued workpiece, waits for a running locate if the queue is empty
+
+        @param timeout: Maximum wait for a running locate in seconds
+        @type timeout: float
+        @return: The position of the next workpiece, RET_FAIL if none is available or a locate failed
+        @rtype: list
+        '''
+        deadline = time.perf_counter() + timeout
+        while True:
+            try:
+                return self._take()
+            except queue.Empty:
+                pass
+            if not self._busy.is_set() or time.perf_counter() > deadline:
+                #A locate may have finished between the two checks
+                try:
+                    return self._take()
+                except queue.Empty:
+                    print("No workpiece queued from EYES")
+                    return RET_FAIL
+            if wait(0.005):
+                return RET_FAIL
+
+    #Private method, pops the next queued item and reports a failed locate
+    def _take(self):
+        item = self._results.get_nowait()
+        if item == RET_FAIL:
+            print("EYES locate failed in the background: " + str(self.last_error))
+        return item
+
+    def close(self):
+        '''
+        Stops the background thread after the running locate
+        '''
+        self._requests.put(None)
+        self._thread.join()
+
+
+if __name__ == '__main__':
+    device = Device()
+    eyes = EYES(device)
+    print("Connection check: ", eyes.isConnected())
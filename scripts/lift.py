@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+
+import time
+import xmlrpc.client
+from device import Device, Sampler, read_batch, wait, abort_event
+import numpy as np
+
+'''
+XML-RPC library for controlling OnRobot devcies from Doosan robots
+
+Global_cbip holds the IP address of the compute box, needs to be defined by the end user
+'''
+
+#Device IDs
+LIFT_ID = 0x100
+
+#LIFT t_index
+LIFT_INDEX = 100
+
+# Connection
+CONN_ERR = -2   # Connection failure
+RET_OK = 0      # Okay
+RET_FAIL = -1   # Error
+
+#Error register bits
+LIFT_ESTOP_BIT = 0x01
+LIFT_ERROR_MASK = 0xfffe
+LIFT_ENC_MISMATCH_BIT = 1 << 3
+
+#Not busy only means arrived once busy was seen or this long after the move command,
+#the busy flag may rise late, the original move waited 0.1 s before the first read
+LIFT_MOVE_SETTLE = 0.1
+
+
+class LIFT():
+    '''
+    This class is for handling the LIFT device
+    '''
+    cb = None
+
+    def __init__(self, dev):
+        self.cb = dev.getCB()
+        #Recorded moves as [distance/speed, duration] rows, used to refine the travel time prediction
+        self._moves = np.zeros((50, 2))
+        self._move_cnt = 0
+        #Fallback for the time spent accelerating and settling, in seconds
+        self.move_overhead = 0.5
+
+    def isConnected(self):
+        '''
+        Returns with True if LIFT is connected, False otherwise
+
+        @return: True if connected, False otherwise
+        @rtype: bool
+        '''
+        isLIFTConn = self.cb.cb_is_device_connected(LIFT_INDEX, LIFT_ID)
+        if not isLIFTConn:
+            print("No LIFT connected")
+            return False
+        else:
+            return True
+
+    def _get_err_register(self):
+        '''
+        Gets the current error code of the LIFT
+
+        @rtype: int
+        @return: Current error register value
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+        lift_error = self.cb.lift_get_error()
+
+        return lift_error
+
+    def state(self):
+        '''
+        Reads position, speed, busy flag and error register in one batched round trip
+        and decodes the error register locally\n
+        The dictionary is indexed with ['pos', 'speed', 'busy', 'estop', 'init', 'error', 'err_register']
+
+        @rtype: dict
+        @return: Current state of the lift
+        '''
+        multi = xmlrpc.client.MultiCall(self.cb)
+        multi.cb_is_device_connected(LIFT_INDEX, LIFT_ID)
+        multi.lift_get_position()
+        multi.lift_get_speed()
+        multi.lift_get_busy()
+        multi.lift_get_error()
+        res = read_batch(multi, "LIFT")
+        if res is None:
+            return CONN_ERR
+
+        pos, speed, busy, err_reg = res
+        return self._decode_state(pos, speed, busy, err_reg)
+
+    #Private method
+    def _decode_state(self, pos, speed, busy, err_reg):
+        error = err_reg & LIFT_ERROR_MASK
+        return {'pos': pos, 'speed': speed, 'busy': busy,
+                'estop': (err_reg & LIFT_ESTOP_BIT) != 0,
+                'init': (error & LIFT_ENC_MISMATCH_BIT) == 0,
+                'error': error, 'err_register': err_reg}
+
+    def isBusy(self):
+        '''
+        Gets if the LIFT is busy or not
+
+        @rtype: bool
+        @return: True if busy, False otherwise
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+        busyFlag = self.cb.lift_get_busy()
+        return busyFlag
+
+    def get_pos(self):
+        '''
+        Gets the current position of the lift
+
+        @rtype: float
+        @return: Current position of the lift in mm
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+        liftpos = self.cb.lift_get_position()
+        return liftpos
+
+    def get_speed(self):
+        '''
+        Gets the current speed of the lift
+
+        @rtype: float
+        @return: Current position of the lift in mm
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+        liftspeed = self.cb.lift_get_speed()
+        return liftspeed
+
+    def get_error(self):
+        '''
+        Gets the current error code of the LIFT
+
+        @rtype: int
+        @return: Current error code
+        '''
+        lift_error = self._get_err_register()
+
+        #Mask out ESTOP bit
+        lift_error = lift_error & LIFT_ERROR_MASK
+
+        return lift_error
+
+    def isESTOP(self):
+        '''
+        Gets if the LIFT is in Emergency Stop state or not
+
+        @rtype: bool
+        @return: True if in ESTOP, False otherwise
+        '''
+        err_field = self._get_err_register()
+
+        if (err_field & LIFT_ESTOP_BIT) != 0:
+            return True
+        else:
+            return False
+
+    def isInit(self):
+        '''
+        Gets if the LIFT is initialized or not
+
+        @rtype: bool
+        @return: True if initialized, False otherwise
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+        error_field = self.get_error()
+
+        #Encoder mismatch is bit 3, if it's on then not inited
+        if (error_field & LIFT_ENC_MISMATCH_BIT == 0):
+            return True
+        else:
+            return False
+
+    def init(self):
+        '''
+        Sends a command that will initialize the device.
+        The lift will move all the way down.
+        '''
+        st = self.state()
+        if st == CONN_ERR:
+            return CONN_ERR
+        #Check for ESTOP
+        if st['estop']:
+            print("Lift is in Emergency Stop state")
+            return RET_FAIL
+
+        #Call init
+        self.cb.lift_initialize()
+        wait(0.1)
+
+        #Wait for init
+        tim_cnt = 0
+        busy_f = self.isBusy()
+        while (busy_f):
+            if wait(0.1):
+                break
+            busy_f = self.isBusy()
+            tim_cnt += 1
+            if tim_cnt > 2000:
+                print("Lift init command timeout")
+                break
+        else:
+            #Check for ESTOP and errors
+            st = self.state()
+            if st == CONN_ERR:
+                return CONN_ERR
+            if st['estop']:
+                print("Lift is in Emergency Stop state")
+                return RET_FAIL
+            else:
+                if st['error'] != 0:
+                    print("Lift error during init")
+                    return RET_FAIL
+                else:
+                    return RET_OK
+        return RET_FAIL
+
+    def halt(self):
+        '''
+        Stops the lift
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        self.cb.lift_stop()
+
+    def predict_move_time(self, distance, speed):
+        '''
+        Predicts the duration of a move\n
+        Once a few moves are recorded, duration = a * distance / speed + b is fitted to them,
+        before that the nominal travel time plus move_overhead is used
+
+        @param distance: Travel distance in mm
+        @type distance: float
+        @param speed: Target speed in mm/s
+        @type speed: float
+        @rtype: float
+        @return: Predicted duration in seconds
+        '''
+        nominal = abs(distance) / max(float(speed), 1.0)
+        n = min(self._move_cnt, len(self._moves))
+        if n < 3:
+            return nominal + self.move_overhead
+        x = self._moves[:n, 0]
+        y = self._moves[:n, 1]
+        if np.ptp(x) == 0.0:
+            return nominal + float(np.mean(y - x))
+        a, b = np.polyfit(x, y, 1)
+        return max(a * nominal + b, 0.0)
+
+    #Private method
+    def _record_move(self, distance, speed, duration):
+        self._moves[self._move_cnt % len(self._moves)] = (abs(distance) / max(float(speed), 1.0), duration)
+        self._move_cnt += 1
+
+    #Private method
+    def _wait_move(self, distance, speed, poll=0.02, timeout=150.0):
+        '''
+        Sleeps until shortly before the predicted arrival, then polls the state tightly
+
+        @return: Final state dictionary, RET_FAIL on timeout or CONN_ERR
+        '''
+        start = time.perf_counter()
+        predicted = self.predict_move_time(distance, speed)
+        #Wake up early by 10% and at least 0.2 s to catch an early arrival
+        early = min(predicted * 0.9, predicted - 0.2)
+        if early > 0:
+            if wait(early):
+                return RET_FAIL
+        else:
+            if wait(poll):
+                return RET_FAIL
+
+        seen_busy = False
+        while True:
+            st = self.state()
+            if st == CONN_ERR:
+                return CONN_ERR
+            seen_busy = seen_busy or st['busy']
+            if not st['busy'] and (seen_busy or time.perf_counter() - start >= LIFT_MOVE_SETTLE):
+                break
+            if time.perf_counter() - start > timeout:
+                print("Lift move command timeout")
+                return RET_FAIL
+            if wait(poll):
+                return RET_FAIL
+
+        if not st['estop']:
+            self._record_move(distance, speed, time.perf_counter() - start)
+        return st
+
+    def start_move(self, trg_pos, trg_speed):
+        '''
+        Checks the lift state and starts a move without waiting for it\n
+        Returns with the state read before the move, the move is only started if
+        the lift is initialized, not in ESTOP or error state and not at the target already
+
+        @type trg_pos: float
+        @param trg_pos: target position to move to (0-900 mm)
+        @type trg_speed: float
+        @param trg_speed: target speed to move with (1-100 mm/s)
+        @return: State dictionary if the move was started, RET_OK if already at the target, RET_FAIL or CONN_ERR otherwise
+        '''
+        st = self.state()
+        if st == CONN_ERR:
+            return CONN_ERR
+
+        #Check for initialized
+        if not st['init']:
+            print("Lift is not initialized")
+            return RET_FAIL
+
+        #Check for ESTOP
+        if st['estop']:
+            print("Lift is in Emergency Stop state")
+            return RET_FAIL
+
+        if abs(st['pos'] - trg_pos) <= 1:
+            #Already at pos
+            return RET_OK
+        if st['error'] != 0:
+            print("Lift is in error state")
+            return RET_FAIL
+
+        self.cb.lift_move(float(trg_pos), float(trg_speed))
+        return st
+
+    def move(self, trg_pos, trg_speed):
+        '''
+        Moves the lift to the target position with the target speed
+
+        @type trg_pos: float
+        @param trg_pos: target position to move to (0-900 mm)
+        @type trg_speed: float
+        @param trg_speed: target speed to move with (1-100 mm/s)
+        '''
+        st = self.start_move(trg_pos, trg_speed)
+        if not isinstance(st, dict):
+            return st
+
+        curr_pos = st['pos']
+        try_cnt = 0
+
+        while ((abs(curr_pos - trg_pos) > 1)):
+            if try_cnt > 0:
+                self.cb.lift_move(float(trg_pos), float(trg_speed))
+            st = self._wait_move(abs(trg_pos - curr_pos), trg_speed)
+            if st == CONN_ERR or st == RET_FAIL:
+                return st
+            #Wait for ESTOP
+            tim_cnt = 0
+            while (st['estop']):
+                if wait(0.1):
+                    return RET_FAIL
+                st = self.state()
+                if st == CONN_ERR:
+                    return CONN_ERR
+                tim_cnt += 1
+                if tim_cnt > 100:
+                    print("Lift IS in Emergency Stop state")
+                    return RET_FAIL
+            #Update pos, err and try_cnt
+            curr_pos = st['pos']
+            try_cnt += 1
+            if (try_cnt > 3):
+                print("Lift didn't move in 3 tries")
+                return RET_FAIL
+        return RET_OK
+
+
+class EstopWatchdog(Sampler):
+    '''
+    This class samples the LIFT error register in the background and on ESTOP aborts
+    every wait of the library, halts the configured devices and notifies the subscribers\n
+    Failed reads are counted in read_errors and max_failures of them in a row trip the
+    watchdog like an ESTOP, exceptions of halts and subscribers are kept in last_error
+    '''
+
+    def __init__(self, dev, period=0.01, latch=True, max_failures=3):
+        '''
+        @param dev: Device object
+        @param period: Sampling period in seconds
+        @type period: float
+        @param latch: Keep the abort active after the ESTOP is released until reset() is called or not?
+        @type latch: bool
+        @param max_failures: Number of failed reads in a row that trip the watchdog like an ESTOP
+        @type max_failures: int
+        '''
+        Sampler.__init__(self, period)
+        self.lift = LIFT(dev)
+        #reset() is called from the program thread, it must not share the proxy of the watchdog thread
+        self._reset_lift = LIFT(dev)
+        self.latch = latch
+        self.max_failures = int(max_failures)
+        #Failed reads in a row and in total, last_error also keeps the exceptions of halts and subscribers
+        self.failures = 0
+        self.read_errors = 0
+        #XML-RPC halt commands issued in one batch on ESTOP, as (method name, args)
+        self.halt_calls = [('lift_stop', ())]
+        self.subscribers = []
+        self.tripped = False
+        self.latency = None
+        self.halt_time = None
+        self._last_clear = None
+
+    def add_halt(self, method, *args):
+        '''
+        Adds an XML-RPC halt command to issue on ESTOP\n
+        Example: watchdog.add_halt('twofg_stop', 0)
+
+        @param method: Name of the ComputeBox method
+        @type method: str
+        '''
+        self.halt_calls.append((method, args))
+
+    def subscribe(self, callback):
+        '''
+        Registers a callback, called with the watchdog object from the watchdog thread on ESTOP
+        '''
+        self.subscribers.append(callback)
+
+    def reset(self):
+        '''
+        Clears the abort so the library can wait again, fails while the ESTOP is still active
+
+        @return: RET_OK if cleared, RET_FAIL if the lift is still in ESTOP, CONN_ERR if the ESTOP state is unknown
+        '''
+        err_reg = self._reset_lift._get_err_register()
+        if err_reg == CONN_ERR:
+            print("Lift ESTOP state cannot be read, the abort is kept")
+            return CONN_ERR
+        if (err_reg & LIFT_ESTOP_BIT) != 0:
+            print("Lift is in Emergency Stop state")
+            return RET_FAIL
+        self.failures = 0
+        self.tripped = False
+        abort_event.clear()
+        return RET_OK
+
+    def _trip(self, last_clear, reason="Lift ESTOP detected"):
+        #The ESTOP happened after the last clear sample, so this is an upper bound of the detection latency
+        detected = time.perf_counter()
+        self.tripped = True
+        abort_event.set()
+        self.latency = detected - last_clear
+
+        #Every halt entry is checked on its own, a faulting one must not hide the others
+        try:
+            multi = xmlrpc.client.MultiCall(self.lift.cb)
+            for method, args in self.halt_calls:
+                getattr(multi, method)(*args)
+            res = multi()
+            for i, (method, args) in enumerate(self.halt_calls):
+                try:
+                    res[i]
+                except xmlrpc.client.Fault as e:
+                    self.last_error = e
+                    print("Halt command " + method + " failed: " + str(e.faultString))
+        except Exception as e:
+            self.last_error = e
+            print("Halt commands failed: " + str(e))
+        self.halt_time = time.perf_counter() - detected
+
+        print(reason + ", all waits aborted")
+        for callback in self.subscribers:
+            try:
+                callback(self)
+            except Exception as e:
+                self.last_error = e
+                print("ESTOP subscriber failed: " + str(e))
+
+    def sample(self):
+        '''
+        Reads the LIFT error register
+
+        @return: Error register
+        @rtype: int
+        '''
+        return self.lift.cb.lift_get_error()
+
+    #The watchdog keeps sampling through the abort it raises itself
+    def _tick(self):
+        try:
+            err_reg = self.sample()
+        except Exception as e:
+            #Nothing is known about the ESTOP while the reads fail, so repeated failures trip
+            self.read_errors += 1
+            self.failures += 1
+            self.last_error = e
+            if self.failures >= self.max_failures and not self.tripped:
+                self._trip(self._last_clear, "Lift ESTOP state cannot be read (" + str(e) + ")")
+            return False
+
+        self.failures = 0
+        estop = (err_reg & LIFT_ESTOP_BIT) != 0
+        if estop and not self.tripped:
+            self._trip(self._last_clear)
+        elif not estop:
+            self._last_clear = time.perf_counter()
+            if self.tripped and not self.latch:
+                self.tripped = False
+                abort_event.clear()
+        return False
+
+    def start(self):
+        '''
+        Starts the watchdog thread
+        '''
+        if self.isRunning():
+            return RET_FAIL
+        if self.lift.isConnected() is False:
+            return CONN_ERR
+        self._last_clear = time.perf_counter()
+        self._start()
+        return RET_OK
+
+
+if __name__ == '__main__':
+    device = Device()
+    lift = LIFT(device)
+    print("Connection check: ", lift.isConnected())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import time
+import xmlrpc.client
+from device import Device, wait
+from lift import LIFT
+from twofg import TWOFG
+from rg2 import RG
+import numpy as np
+
+'''
+Coordinated motion of the LIFT and the grippers
+
+The LIFT move and the gripper moves are started together and waited for with one
+shared poller, that reads every device with a single batched round trip per tick
+'''
+
+# Connection
+CONN_ERR = -2   # Connection failure
+RET_OK = 0      # Okay
+RET_FAIL = -1   # Error
+
+#Gripper move timeout in seconds, same as the 30 x 0.1 s wait loops of the gripper classes
+GRIPPER_TIMEOUT = 3.0
+#LIFT move timeout in seconds
+LIFT_TIMEOUT = 150.0
+#A device that was never seen busy only counts as done this long after the start commands,
+#same as the 0.1 s wait after the move commands of the device classes
+MOVE_SETTLE = 0.1
+
+
+#Starts a gripper move without waiting, per gripper class
+def _start_twofg(gripper, spec):
+    return gripper.move(spec['t_index'], spec['width'], False)
+
+
+def _start_rg(gripper, spec):
+    return gripper.move(spec['t_index'], spec['width'], spec.get('force', 40), False)
+
+
+#Busy flag getter and move starter per gripper class
+GRIPPER_CALLS = {
+    TWOFG: ('twofg_get_busy', _start_twofg),
+    RG: ('rg_get_busy', _start_rg),
+}
+
+
+def move_together(lift, trg_pos, trg_speed, gripper_moves, poll=0.02):
+    '''
+    Starts a LIFT move and one or more gripper moves together and waits for all of them\n
+    Each gripper move is a dictionary with the keys 'gripper' (TWOFG or RG object),
+    't_index', 'width' and for RG optionally 'force'\n
+    The returned dictionary is indexed with ['result', 'lift', 'grippers', 'times', 'total']
+    where lift and grippers hold the result codes and times holds the completion time
+    of the lift followed by the grippers in seconds
+
+    @param lift: LIFT object
+    @param trg_pos: LIFT target position (0-900 mm)
+    @type trg_pos: float
+    @param trg_speed: LIFT target speed (1-100 mm/s)
+    @type trg_speed: float
+    @param gripper_moves: List of gripper move dictionaries
+    @type gripper_moves: list
+    @param poll: Polling period in seconds
+    @type poll: float
+    @return: Combined result dictionary
+    @rtype: dict
+    '''
+    for spec in gripper_moves:
+        if type(spec['gripper']) not in GRIPPER_CALLS:
+            print("Unsupported gripper in coordinated move, TWOFG or RG only")
+            return RET_FAIL
+
+    start = time.perf_counter()
+    n = len(gripper_moves)
+    results = np.full(n + 1, RET_FAIL, dtype=int)
+    times = np.full(n + 1, np.nan)
+    pending = np.zeros(n + 1, dtype=bool)
+    seen_busy = np.zeros(n + 1, dtype=bool)
+
+    #Start everything before waiting on anything
+    st = lift.start_move(trg_pos, trg_speed)
+    if isinstance(st, dict):
+        pending[0] = True
+    else:
+        results[0] = st
+        times[0] = 0.0
+    for i, spec in enumerate(gripper_moves):
+        res = GRIPPER_CALLS[type(spec['gripper'])][1](spec['gripper'], spec)
+        if res == RET_OK:
+            pending[i + 1] = True
+        else:
+            results[i + 1] = res
+            times[i + 1] = 0.0
+
+    #The timeouts and the settle time run from the issued start commands
+    started = time.perf_counter()
+    while pending.any():
+        if wait(poll):
+            break
+        #Only the pending devices are read, a device that failed to start or dropped may fault
+        multi = xmlrpc.client.MultiCall(lift.cb)
+        if pending[0]:
+            multi.lift_get_position()
+            multi.lift_get_speed()
+            multi.lift_get_busy()
+            multi.lift_get_error()
+        polled = [i for i in range(1, n + 1) if pending[i]]
+        for i in polled:
+            spec = gripper_moves[i - 1]
+            getattr(multi, GRIPPER_CALLS[type(spec['gripper'])][0])(spec['t_index'])
+        res = multi()
+        tick = time.perf_counter()
+        now = tick - start
+        elapsed = tick - started
+
+        entry = 0
+        if pending[0]:
+            entry = 4
+            try:
+                st = lift._decode_state(res[0], res[1], res[2], res[3])
+            except xmlrpc.client.Fault as e:
+                print("Failed to read LIFT in coordinated move: " + str(e.faultString))
+                pending[0] = False
+                times[0] = now
+                results[0] = CONN_ERR
+            else:
+                #Busy may rise only a while after the command, not busy before that is not done
+                seen_busy[0] |= st['busy']
+                if not st['busy'] and (seen_busy[0] or elapsed >= MOVE_SETTLE):
+                    pending[0] = False
+                    times[0] = now
+                    if st['estop']:
+                        print("Lift is in Emergency Stop state")
+                    elif abs(st['pos'] - trg_pos) > 1:
+                        print("Lift didn't reach the target position")
+                    else:
+                        results[0] = RET_OK
+                elif elapsed > LIFT_TIMEOUT:
+                    pending[0] = False
+                    times[0] = now
+                    print("Lift move command timeout")
+
+        for entry, i in enumerate(polled, entry):
+            try:
+                busy = res[entry]
+            except xmlrpc.client.Fault as e:
+                print("Failed to read gripper in coordinated move: " + str(e.faultString))
+                pending[i] = False
+                times[i] = now
+                results[i] = CONN_ERR
+                continue
+            seen_busy[i] |= busy
+            if not busy and (seen_busy[i] or elapsed >= MOVE_SETTLE):
+                pending[i] = False
+                times[i] = now
+                results[i] = RET_OK
+            elif elapsed > GRIPPER_TIMEOUT:
+                pending[i] = False
+                times[i] = now
+                print("Gripper move command timeout in coordinated move")
+
+    return {'result': RET_OK if (results == RET_OK).all() else RET_FAIL,
+            'lift': int(results[0]), 'grippers': results[1:].tolist(),
+            'times': times, 'total': time.perf_counter() - start}
+
+
+if __name__ == '__main__':
+    device = Device()
+    lift = LIFT(device)
+    gripper_2FG7 = TWOFG(device)
+    print("Connection check: ", lift.isConnected(), gripper_2FG7.isConnected())
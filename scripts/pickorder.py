@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import time
+import numpy as np
+
+'''
+Pick order optimization over workpiece poses returned by EYES
+
+The pick sequence is an open path from the current robot pose through every workpiece,
+built with nearest neighbour and refined with 2-opt moves that are evaluated for all
+segment pairs at once on the distance matrix
+'''
+
+
+def distance_matrix(points):
+    '''
+    Returns with the Euclidean distances between all points
+
+    @param points: Array of shape (points, 3)
+    @return: Array of shape (points, points)
+    @rtype: numpy.ndarray
+    '''
+    sq = (points * points).sum(axis=1)
+    dist2 = sq[:, None] + sq[None, :] - 2.0 * (points @ points.T)
+    return np.sqrt(np.maximum(dist2, 0.0))
+
+
+def path_length(dist, path):
+    '''
+    Returns with the length of a path over a distance matrix
+
+    @param dist: Distance matrix
+    @param path: Node indices in visiting order
+    @rtype: float
+    '''
+    path = np.asarray(path)
+    return float(dist[path[:-1], path[1:]].sum())
+
+
+def _nearest_neighbour(dist):
+    n = len(dist)
+    left = dist.copy()
+    left[:, 0] = np.inf
+    path = np.zeros(n, dtype=int)
+    for k in range(1, n):
+        path[k] = np.argmin(left[path[k - 1]])
+        left[:, path[k]] = np.inf
+    return path
+
+
+def _two_opt(dist, path, deadline):
+    #A dummy end node with zero distance to every node turns the open path into a closed one
+    n = len(dist)
+    ext = np.zeros((n + 1, n + 1))
+    ext[:n, :n] = dist
+    path = np.append(path, n)
+    edges = ext[path[:-1], path[1:]]
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        #Reversing path[i..j] for all j > i at once, start and dummy stay in place
+        for i in range(1, n - 1):
+            if time.perf_counter() > deadline:
+                break
+            j = np.arange(i + 1, n)
+            gain = (ext[path[i - 1], path[j]] + ext[path[i], path[j + 1]]
+                    - edges[i - 1] - edges[j])
+            k = np.argmin(gain)
+            if gain[k] < -1e-9:
+                j = j[k]
+                path[i:j + 1] = path[i:j + 1][::-1]
+                edges[i - 1:j + 1] = ext[path[i - 1:j + 1], path[i:j + 2]]
+                improved = True
+    return path[:-1]
+
+
+def pick_order(poses, start, budget=0.005):
+    '''
+    Returns with a travel minimizing pick sequence\n
+    Travel is measured on the x, y, z position only, rotations are not taken into account
+
+    @param poses: Workpiece poses, e.g. the array of EYES.get_objects, the first three columns are x, y, z
+    @param start: Current robot pose as [x, y, z, rx, ry, rz]
+    @param budget: Time budget in seconds, the 2-opt refinement stops when it runs out
+    @type budget: float
+    @return: (order, length) where order indexes the rows of poses and length is the travel in mm
+    @rtype: tuple
+    '''
+    deadline = time.perf_counter() + budget
+    poses = np.asarray(poses, dtype=float)
+    if len(poses) == 0:
+        return np.zeros(0, dtype=int), 0.0
+    points = np.vstack((np.asarray(start, dtype=float)[:3], poses[:, :3]))
+    dist = distance_matrix(points)
+
+    path = _nearest_neighbour(dist)
+    if len(poses) > 2:
+        path = _two_opt(dist, path, deadline)
+    return path[1:] - 1, path_length(dist, path)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    parts = rng.uniform(0, 400, (200, 6))
+    start = time.perf_counter()
+    order, length = pick_order(parts, [0, 0, 0, 0, 0, 0])
+    print("Pick order of %d parts: %.1f mm in %.1f ms" % (len(parts), length, (time.perf_counter() - start) * 1000))
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 import time
-from device import Device
+from device import Device, wait
 import numpy as np
 
 '''
@@ -65,7 +65,8 @@ class RG():
             tim_cnt = 0
             fbusy = self.cb.rg_get_busy(t_index)
             while (fbusy):
-                time.sleep(0.1)
+                if wait(0.1):
+                    break
                 fbusy = self.cb.rg_get_busy(t_index)
                 tim_cnt += 1
                 if tim_cnt > 30:
@@ -99,7 +100,8 @@ class RG():
             tim_cnt = 0
             fbusy = self.cb.rg_get_busy(t_index)
             while (fbusy):
-                time.sleep(0.1)
+                if wait(0.1):
+                    break
                 fbusy = self.cb.rg_get_busy(t_index)
                 tim_cnt += 1
                 if tim_cnt > 30:
@@ -110,7 +112,8 @@ class RG():
                 grip_tim = 0
                 gripped = self.isGripped(t_index)
                 while (not gripped):
-                    time.sleep(0.1)
+                    if wait(0.1):
+                        break
                     gripped = self.isGripped(t_index)
                     grip_tim += 1
                     if grip_tim > 20:
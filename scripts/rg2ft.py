@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+
+import time
+from device import Device, Sampler, wait
+import numpy as np
+
+'''
+XML-RPC library for controlling OnRobot devcies from Doosan robots
+
+Global_cbip holds the IP address of the compute box, needs to be defined by the end user
+'''
+
+#Device IDs
+RG2FT_ID = 0x22
+
+#RG2FT t_index
+HEX_INDEX = -1
+
+# Connection
+CONN_ERR = -2   # Connection failure
+RET_OK = 0      # Okay
+RET_FAIL = -1   # Error
+
+
+class RG2FT():
+    '''
+    This class is for handling the RG2FT device
+    '''
+    cb = None
+
+    def __init__(self, dev):
+        self.cb = dev.getCB()
+
+    def isConnected(self):
+        '''
+        Returns with True if an RG2FT is connected, False otherwise
+
+        @return: True if connected, False otherwise
+        @rtype: bool
+        '''
+        IsRG2FT = self.cb.cb_is_device_connected(HEX_INDEX, RG2FT_ID)
+        if IsRG2FT is False:
+            print("No RG2FT device connected to the system")
+            return False
+        else:
+            return True
+
+    #Private method
+    def _get_all_var(self):
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.rg2ft_get_all_variables()
+
+    def get_left_hex(self):
+        '''
+        Returns with a dictionary containing the current force data of the left HEX sensor\n
+        The dictionary is indexed with ['Fx', 'Fy', 'Fz', 'Tx', 'Ty', 'Tz']
+
+        @return: Current force data dictionary
+        @rtype: dict
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        return dict(zip(['Fx', 'Fy', 'Fz', 'Tx', 'Ty', 'Tz'], all_var['left_hex']))
+
+    def get_right_hex(self):
+        '''
+        Returns with a dictionary containing the current force data of the right HEX sensor\n
+        The dictionary is indexed with ['Fx', 'Fy', 'Fz', 'Tx', 'Ty', 'Tz']
+
+        @return: Current force data dictionary
+        @rtype: dict
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        return dict(zip(['Fx', 'Fy', 'Fz', 'Tx', 'Ty', 'Tz'], all_var['right_hex']))
+
+    def get_left_proxi(self):
+        '''
+        Returns with the left proximity sensor value
+
+        @return: Proximity in mm
+        @rtype: float
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        return all_var['left_proxi']
+
+    def get_right_proxi(self):
+        '''
+        Returns with the right proximity sensor value
+
+        @return: Proximity in mm
+        @rtype: float
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        return all_var['right_proxi']
+
+    def get_width(self):
+        '''
+        Returns with the width of the gripper
+
+        @return: Width in mm
+        @rtype: float
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        return all_var['width']
+
+    def get_status(self):
+        '''
+        Returns with the status code of the device
+
+        @return: Status code
+        @rtype: int
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        return all_var['status']
+
+    def isBusy(self):
+        '''
+        Gets if the gripper is busy or not
+
+        @rtype: bool
+        @return: True if busy, False otherwise
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        return all_var['busy']
+
+    def isGripped(self):
+        '''
+        Gets if the gripper is gripping or not
+
+        @rtype: bool
+        @return: True if part gripped, False otherwise
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        return all_var['grip_detected']
+
+    def set_prox_offset(self, lprox, rprox):
+        '''
+        Apply the given offsets to the proximity sensor values
+
+        @param lprox: Left proximity offet
+        @param rprox: Right proximity offet
+        @type lprox: int
+        @type rprox: int
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        #Sanity check
+        if lprox > 120 or lprox < 0:
+            print("Invalid parameter for left proximity, range is 0-120")
+            return RET_FAIL
+
+        if rprox > 120 or rprox < 0:
+            print("Invalid parameter for right proximity, range is 0-120")
+            return RET_FAIL
+
+        self.cb.rg2ft_proxi_offsets(int(lprox), int(rprox))
+
+    #Read the current proximity values and set them as offsets
+    def set_prox_offset_curr(self):
+        '''
+        Applies the current proximity sensor values as offset
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        self.cb.rg2ft_proxi_offsets(int(all_var['left_proxi']), int(all_var['right_proxi']))
+
+    #Get the objects size between the fingers
+    def get_obj_width(self):
+        '''
+        Returns with the objects with that it is in the gripper\n
+        Calculated the following way: width - left proxi - right proxi
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        all_var = self._get_all_var()
+
+        return all_var['width'] - all_var['left_proxi'] - all_var['right_proxi']
+
+    def halt(self):
+        '''
+        Stops the grippers movement
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        self.cb.rg2ft_grip_stop()
+
+    def grip(self, width=20, force=20, f_wait=True):
+        '''
+        Starts a grip command
+
+        @param width: The width to grip 0-100 mm
+        @type width: int
+        @param force: The force to grip width 0-40 N
+        @type force: int
+        @type f_wait: bool
+        @param f_wait: wait for the grip to end or not?
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        #Sanity check
+        if width < 0 or width > 100:
+            print("Invalid width for RG2FT grip, 0-100 valid only")
+            return RET_FAIL
+
+        if force < 0 or force > 40:
+            print("Invalid force for RG2FT grip, 0-40 valid only")
+            return RET_FAIL
+
+        #Blocking and depth comp should be False?
+        self.cb.rg2ft_grip(int(width), int(force), False, False)
+
+        if f_wait:
+            tim_cnt = 0
+            fbusy = self.isBusy()
+            while (fbusy):
+                if wait(0.1):
+                    break
+                fbusy = self.isBusy()
+                tim_cnt += 1
+                if tim_cnt > 30:
+                    print("RG2FT grip timeout")
+                    break
+            else:
+                #Grip detection
+                grip_tim = 0
+                gripped = self.isGripped()
+                while (not gripped):
+                    if wait(0.1):
+                        break
+                    gripped = self.isGripped()
+                    grip_tim += 1
+                    if grip_tim > 20:
+                        print("RG2FT grip detection timeout")
+                        break
+                else:
+                    return RET_OK
+                return RET_FAIL
+            return RET_FAIL
+        else:
+            return RET_OK
+
+    #No grip detection
+    def move(self, width=20, f_wait=True):
+        '''
+        Starts a move command
+
+        @param width: The width to grip 0-100 mm
+        @type width: int
+        @type f_wait: bool
+        @param f_wait: wait for the grip to end or not?
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        #Sanity check
+        if width < 0 or width > 100:
+            print("Invalid width for RG2FT grip, 0-100 valid only")
+            return RET_FAIL
+
+        #Blocking and depth comp should be False?
+        self.cb.rg2ft_grip(int(width), 40, False, False)
+
+        if f_wait:
+            tim_cnt = 0
+            fbusy = self.isBusy()
+            while (fbusy):
+                if wait(0.1):
+                    break
+                fbusy = self.isBusy()
+                tim_cnt += 1
+                if tim_cnt > 30:
+                    print("RG2FT move timeout")
+                    break
+            else:
+                return RET_OK
+            return RET_FAIL
+        else:
+            return RET_OK
+
+    def grip_on_proximity(self, distance, width=20, force=20, timeout=10.0, period=0.005):
+        '''
+        Streams the proximity sensors while the robot approaches and starts a grip
+        as soon as both fingers are within the given distance\n
+        The returned dictionary is indexed with ['result', 'left_proxi', 'right_proxi', 'samples', 'latency']
+        where latency is the time in seconds from the detecting sample to the issued grip command
+
+        @param distance: Proximity in mm at which the grip is started
+        @type distance: float
+        @param width: The width to grip 0-100 mm
+        @type width: int
+        @param force: The force to grip width 0-40 N
+        @type force: int
+        @param timeout: Maximum time to wait for the part in seconds
+        @type timeout: float
+        @param period: Sampling period in seconds
+        @type period: float
+        @return: Approach result dictionary
+        @rtype: dict
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        #Sanity check
+        if width < 0 or width > 100:
+            print("Invalid width for RG2FT grip, 0-100 valid only")
+            return RET_FAIL
+
+        if force < 0 or force > 40:
+            print("Invalid force for RG2FT grip, 0-40 valid only")
+            return RET_FAIL
+
+        res = dict.fromkeys(['result', 'left_proxi', 'right_proxi', 'samples', 'latency'])
+        res['result'] = RET_FAIL
+        res['samples'] = 0
+
+        deadline = time.perf_counter() + timeout
+        next_tick = time.perf_counter()
+        while next_tick < deadline:
+            all_var = self.cb.rg2ft_get_all_variables()
+            detected = time.perf_counter()
+            res['samples'] += 1
+            res['left_proxi'] = all_var['left_proxi']
+            res['right_proxi'] = all_var['right_proxi']
+            if all_var['left_proxi'] <= distance and all_var['right_proxi'] <= distance:
+                self.cb.rg2ft_grip(int(width), int(force), False, False)
+                res['latency'] = time.perf_counter() - detected
+                res['result'] = RET_OK
+                return res
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay <= 0:
+                next_tick = time.perf_counter()
+            if wait(max(delay, 0)):
+                return res
+
+        print("RG2FT proximity approach timeout")
+        return res
+
+
+class SlipMonitor(Sampler):
+    '''
+    This class is for detecting slip of a part held by an RG2FT\n
+    The tangential (Fx, Fy) to normal (Fz) force ratio of both fingertips is
+    evaluated over a sliding window of rg2ft_get_all_variables samples
+    '''
+    #A slip cannot be acted on after an abort anyway
+    abortable = True
+
+    def __init__(self, dev, ratio_limit=0.6, window=10, confirm=3, min_normal=1.0, period=0.005):
+        '''
+        @param dev: Device object
+        @param ratio_limit: Tangential/normal force ratio above which a finger is slipping
+        @type ratio_limit: float
+        @param window: Number of samples kept in the sliding window
+        @type window: int
+        @param confirm: Number of consecutive samples over the limit that flag a slip
+        @type confirm: int
+        @param min_normal: Normal force floor in N, avoids dividing by a vanishing normal force
+        @type min_normal: float
+        @param period: Sampling period in seconds
+        @type period: float
+        '''
+        if confirm < 1 or confirm > window:
+            raise ValueError("confirm must be between 1 and window")
+
+        Sampler.__init__(self, period)
+        self.gripper = RG2FT(dev)
+        self.ratio_limit = float(ratio_limit)
+        self.confirm = int(confirm)
+        self.min_normal = float(min_normal)
+
+        #Ring buffer of [Fx, Fy, Fz] for the left and right fingertip
+        self._forces = np.zeros((int(window), 2, 3))
+        self._head = 0
+        self._count = 0
+
+        self.regrip = None
+        self.callback = None
+        self.slipped = False
+        self.slip_time = None
+        self.latency = None
+
+    def set_regrip(self, width, force):
+        '''
+        Re-grips with RG2FT.grip (not waiting) when a slip is detected
+
+        @param width: The width to grip 0-100 mm
+        @param force: The force to grip width 0-40 N
+        '''
+        self.regrip = (width, force)
+
+    def reset(self):
+        '''
+        Clears the sliding window and the slip flag
+        '''
+        self._forces[:] = 0.0
+        self._head = 0
+        self._count = 0
+        self.slipped = False
+        self.slip_time = None
+        self.latency = None
+
+    def ratios(self):
+        '''
+        Returns with the tangential/normal force ratios of the samples in the window
+
+        @return: Array of shape (samples, 2), oldest sample first, columns are left and right finger
+        @rtype: numpy.ndarray
+        '''
+        n = min(self._count, len(self._forces))
+        idx = (self._head - n + np.arange(n)) % len(self._forces)
+        f = self._forces[idx]
+        tangential = np.hypot(f[..., 0], f[..., 1])
+        normal = np.maximum(np.abs(f[..., 2]), self.min_normal)
+        return tangential / normal
+
+    def update(self, all_var):
+        '''
+        Adds one rg2ft_get_all_variables sample to the window
+
+        @param all_var: Result of rg2ft_get_all_variables
+        @type all_var: dict
+        @return: True if the window indicates slip, False otherwise
+        @rtype: bool
+        '''
+        self._forces[self._head, 0] = all_var['left_hex'][:3]
+        self._forces[self._head, 1] = all_var['right_hex'][:3]
+        self._head = (self._head + 1) % len(self._forces)
+        self._count += 1
+
+        if self._count < self.confirm:
+            return False
+        last = self.ratios()[-self.confirm:]
+        return bool(np.any(np.all(last > self.ratio_limit, axis=0)))
+
+    def watch(self, timeout=10.0):
+        '''
+        Samples the fingertip sensors until a slip is detected or the timeout elapses
+
+        @param timeout: Maximum monitoring time in seconds
+        @type timeout: float
+        @return: True if slip was detected, False on timeout or stop, CONN_ERR without device
+        '''
+        if self.gripper.isConnected() is False:
+            return CONN_ERR
+
+        self.reset()
+        return self._loop(timeout)
+
+    def sample(self):
+        '''
+        Reads the fingertip sensors once and adds them to the window
+
+        @return: True if the window indicates slip, False otherwise
+        @rtype: bool
+        '''
+        return self.update(self.gripper.cb.rg2ft_get_all_variables())
+
+    def _tick(self):
+        sample_time = time.perf_counter()
+        if self.sample():
+            self._on_slip(sample_time)
+            return True
+        return False
+
+    def _on_slip(self, sample_time):
+        #Latency is measured from the first over-limit sample of the confirming run
+        self.slipped = True
+        self.slip_time = time.perf_counter()
+        self.latency = self.slip_time - sample_time + (self.confirm - 1) * self.period
+        if self.regrip is not None:
+            self.gripper.grip(self.regrip[0], self.regrip[1], False)
+        if self.callback is not None:
+            self.callback(self)
+
+    def start(self, timeout=60.0, callback=None):
+        '''
+        Runs watch() in a background thread
+
+        @param timeout: Maximum monitoring time in seconds
+        @param callback: Called with the monitor object when a slip is detected
+        '''
+        if self.isRunning():
+            return RET_FAIL
+        self.callback = callback
+        self._start(self.watch, timeout)
+        return RET_OK
+
+
+if __name__ == '__main__':
+    device = Device()
+    gripper_RG2FT = RG2FT(device)
+    print("Connection check: ", gripper_RG2FT.isConnected())
@@ -0,0 +1,643 @@
+#!/usr/bin/env python3
+
+import time
+import xmlrpc.client
+from device import Device, read_batch, wait
+import numpy as np
+
+'''
+XML-RPC library for controlling OnRobot devcies from Doosan robots
+
+Global_cbip holds the IP address of the compute box, needs to be defined by the end user
+'''
+
+#Device IDs
+SD_ID = 0x80
+
+# Connection
+CONN_ERR = -2   # Connection failure
+RET_OK = 0      # Okay
+RET_FAIL = -1   # Error
+
+#Columns of a captured screwing trace
+SD_TRACE_COLUMNS = ('time', 'torque', 'shank_pos', 'force', 'torque_grad')
+
+#Error code bits, init error field and command results
+SD_ERROR_FLAGS = ((0x04, "Screw driver saftey circuit triggered"),
+                  (0x08, "Screw driver not calibrated"),
+                  (0x100, "Wrong Quick changer type for the Screw driver"),
+                  (0x200, "Wrong Power Supply Type for the screw driver"))
+SD_INIT_ERR_MASK = 0xF0
+SD_INIT_ERRORS = {
+    0x10: "Shank stall current not reached",
+    0x20: "No shank index mark found",
+    0x30: "Unable to home shank",
+    0x40: "Invalid shank index placement",
+    0x50: "No torque index mark found",
+    0x60: "Torque difference overflow",
+    0x70: "Index mark value has changed (clean encoder disk)",
+}
+SD_CMD_RESULTS = {
+    1: "Unknown command",
+    2: "Not screwing in",
+    3: "Timeout waiting for torque",
+    4: "Torque exceeded prematurely",
+    5: "Unable to loosen screw",
+    6: "Shank reached the end",
+    7: "Shank obstructed during move",
+}
+
+#Columns of the per screw timings of SD.run_job, in seconds
+SD_JOB_COLUMNS = ('pickup', 'move', 'tighten', 'total')
+#Result of the screws SD.run_job did not attempt, after a failed screw with stop_on_error
+SD_JOB_SKIPPED = 1
+
+
+class SD():
+    '''
+    This class is for handling the Screw driver
+    '''
+    cb = None
+
+    def __init__(self, dev):
+        #To turn on/off error handling for this instance (def: ON)
+        self.err_h = [True, True, True]
+        self.cb = dev.getCB()
+        self.set_capture()
+
+    def isConnected(self, t_index=0):
+        '''
+        Returns with True if Screw driver is connected, False otherwise
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @return: True if connected, False otherwise
+        @rtype: bool
+        '''
+        isSDConn = self.cb.cb_is_device_connected(t_index, SD_ID)
+        if not isSDConn:
+            print("No Screw driver connected")
+            return False
+        else:
+            return True
+
+    def setErrhON(self, t_index=0):
+        '''
+        Turns ON error handling for all screwdriver commands
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        '''
+        self.err_h[t_index] = True
+
+    def setErrhOFF(self, t_index=0):
+        '''
+        Turns OFF error handling for all screwdriver commands
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        '''
+        self.err_h[t_index] = False
+
+    def getErrh(self, t_index=0):
+        '''
+        Gets if error handling is turned ON or OFF for the given instance
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @return: True if error handling is turned on for this instance, False if turned off
+        @rtype: bool
+        '''
+        return self.err_h[t_index]
+
+    def set_capture(self, max_samples=4000, period=0.01):
+        '''
+        Sets up the trace buffer used by tighten, loosen and pickup_screw when called with capture=True
+
+        @param max_samples: Number of samples the buffer can hold, later samples are dropped
+        @type max_samples: int
+        @param period: Sampling period in seconds
+        @type period: float
+        '''
+        self.capture_period = float(period)
+        self._trace = np.zeros((int(max_samples), len(SD_TRACE_COLUMNS)))
+
+    #Private function
+    def _err_handler(self, t_index):
+        '''
+        Checks ant interprets command result and erro code
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @return: True if error, False otherwise
+        @rtype: bool
+        '''
+        err = self.get_error(t_index)
+        if err == CONN_ERR:
+            return CONN_ERR
+
+        return err['error']
+
+    def get_error(self, t_index=0):
+        '''
+        Reads the connection state, error code and command result in one batched round trip
+        and decodes them\n
+        The returned dictionary is indexed with ['error', 'err_code', 'cmd_result', 'messages'],
+        error is True if the last command failed (nonzero command result), err_code is only reported
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @return: Decoded error dictionary
+        @rtype: dict
+        '''
+        multi = xmlrpc.client.MultiCall(self.cb)
+        multi.cb_is_device_connected(t_index, SD_ID)
+        multi.sd_get_error_code(t_index)
+        multi.sd_get_command_results(t_index)
+        res = read_batch(multi, "Screw driver")
+        if res is None:
+            return CONN_ERR
+
+        err_code, cmd_result = res
+        return self._decode_err(err_code, cmd_result)
+
+    #Private function
+    def _decode_err(self, err_code, cmd_result):
+        '''
+        Interprets and reports an error code and command result pair
+
+        @return: Decoded error dictionary, see get_error
+        @rtype: dict
+        '''
+        messages = [msg for bit, msg in SD_ERROR_FLAGS if err_code & bit]
+        init_err = err_code & SD_INIT_ERR_MASK
+        if init_err:
+            messages.append("Screw driver init error: " + SD_INIT_ERRORS.get(init_err, "Unknown init error"))
+        if cmd_result != 0:
+            messages.append("Screwdriver command result: " + SD_CMD_RESULTS.get(cmd_result, "Unknown command result"))
+
+        for msg in messages:
+            print(msg)
+
+        #The error code is only reported, a command failed if its result is nonzero
+        return {'error': cmd_result != 0, 'err_code': err_code,
+                'cmd_result': cmd_result, 'messages': messages}
+
+    #Private function
+    def _wait(self, t_index, max_cnt, timeout_msg):
+        '''
+        Polls the busy flags every 0.1 s
+
+        @return: True if timed out, False otherwise
+        @rtype: bool
+        '''
+        busy_cnt = 0
+        f_busy = self.isBusy(t_index)
+        while (f_busy):
+            if wait(0.1):
+                return True
+            f_busy = self.isBusy(t_index)
+            busy_cnt += 1
+            if busy_cnt > max_cnt:
+                print(timeout_msg)
+                return True
+        return False
+
+    #Private function
+    def _wait_capture(self, t_index, max_cnt, timeout_msg):
+        '''
+        Waits like _wait but samples torque, shank position, force and torque gradient
+        together with the busy flags in one batched read per capture period
+
+        @return: (True if timed out, CONN_ERR if the read failed, False otherwise; captured trace)
+        @rtype: tuple
+        '''
+        buf = self._trace
+        deadline = time.perf_counter() + max_cnt * 0.1
+        start = time.perf_counter()
+        next_tick = start
+        count = 0
+        while True:
+            multi = xmlrpc.client.MultiCall(self.cb)
+            multi.sd_get_shank_busy(t_index)
+            multi.sd_get_screwdriver_busy(t_index)
+            multi.sd_get_current_torque(t_index)
+            multi.sd_get_shank_position(t_index)
+            multi.sd_get_force(t_index)
+            multi.sd_get_torque_gradient(t_index)
+            #The getters fault if the device drops during the command
+            try:
+                shank_busy, dev_busy, torq, shank, force, grad = multi()
+            except xmlrpc.client.Fault as e:
+                print("Failed to read Screw driver: " + str(e.faultString))
+                return CONN_ERR, buf[:count].copy()
+            if count < len(buf):
+                buf[count] = (time.perf_counter() - start, torq, shank, force, grad)
+                count += 1
+            if not shank_busy and not dev_busy:
+                return False, buf[:count].copy()
+            if time.perf_counter() > deadline:
+                print(timeout_msg)
+                return True, buf[:count].copy()
+            next_tick += self.capture_period
+            delay = next_tick - time.perf_counter()
+            if delay <= 0:
+                next_tick = time.perf_counter()
+            if wait(max(delay, 0)):
+                return True, buf[:count].copy()
+
+    #Private function
+    def _finish(self, t_index, f_wait, max_cnt, timeout_msg, capture):
+        '''
+        Waits for the started command and checks its result
+
+        @return: Result code, or (result code, trace) tuple if capture is True
+        '''
+        timeout = False
+        trace = None
+        if f_wait:
+            if capture:
+                timeout, trace = self._wait_capture(t_index, max_cnt, timeout_msg)
+            else:
+                timeout = self._wait(t_index, max_cnt, timeout_msg)
+
+        #Check for error
+        if timeout == CONN_ERR:
+            res = CONN_ERR
+        elif self.err_h[t_index]:
+            err_state = self._err_handler(t_index)
+            #There was no error and no timeout
+            if (err_state == False) and (timeout == False):
+                res = RET_OK
+            else:
+                res = RET_FAIL
+        #There was no error handling only check timeout
+        else:
+            if timeout:
+                res = RET_FAIL
+            else:
+                res = RET_OK
+
+        if capture:
+            return res, trace
+        return res
+
+    #Private function
+    def _result(self, res, capture):
+        '''
+        Returns with a result code in the form the caller asked for, (result code, None) with capture
+        '''
+        if capture:
+            return res, None
+        return res
+
+    def isBusy(self, t_index=0):
+        '''
+        Gets if the screw driver is busy or not
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @rtype: bool
+        @return: True if busy, False otherwise
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        shank_busy = self.cb.sd_get_shank_busy(t_index)
+        dev_busy = self.cb.sd_get_screwdriver_busy(t_index)
+
+        if ((not shank_busy) and (not dev_busy)):
+            return False
+        else:
+            return True
+
+    def get_torque_grad(self, t_index=0):
+        '''
+        Gets the torque gradient result
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @rtype: float
+        @return: Torque gradient
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self.cb.sd_get_torque_gradient(t_index)
+
+    def get_shank_pos(self, t_index=0):
+        '''
+        Gets the current shank position
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @rtype: float
+        @return: Shank position in mm
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self.cb.sd_get_shank_position(t_index)
+
+    def get_force(self, t_index=0):
+        '''
+        Gets the current force
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @rtype: float
+        @return: Current force in N
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self.cb.sd_get_force(t_index)
+
+    def get_ach_torq(self, t_index=0):
+        '''
+        Gets the achieved torque
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @rtype: float
+        @return: Achieved torque in Nm
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self.cb.sd_get_achieved_torque(t_index)
+
+    def get_curr_torq(self, t_index=0):
+        '''
+        Gets the current torque
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @rtype: float
+        @return: Current torque in Nm
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self.cb.sd_get_current_torque(t_index)
+
+    def tighten(self, t_index, force, screw_len, torq, f_wait=True, capture=False):
+        '''
+        Starts a screw tighten command\n
+        With capture the trace columns are SD_TRACE_COLUMNS
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @param force:  Screw in force in N (18-30)
+        @type force: int
+        @param screw_len: Screwing lenght in mm (0-35)
+        @type screw_len: float
+        @param torq: Screw in torque in Nm (0-5)
+        @type torq: float
+        @param f_wait: Wait for command to finish or not?
+        @type f_wait: bool
+        @param capture: Capture the torque/shank trace while waiting and return (result, trace),
+        trace is None if the command was not started
+        @type capture: bool
+        '''
+        if self.isConnected(t_index) is False:
+            return self._result(CONN_ERR, capture)
+
+        #Sanity check
+        if force < 18 or force > 30:
+            print("Invalid force parameter for tighten command, valid range: 18-30")
+            return self._result(RET_FAIL, capture)
+
+        if screw_len < 0.0 or screw_len > 35.0:
+            print("Invalid screw length for tighten command, valid range: 0-35")
+            return self._result(RET_FAIL, capture)
+
+        if torq < 0.0 or torq > 5.0:
+            print("Invalid torque parameter for tighten command, valid range: 0-5")
+            return self._result(RET_FAIL, capture)
+
+        self.cb.sd_tighten(t_index, int(force), float(screw_len), float(torq))
+
+        return self._finish(t_index, f_wait, 300, "Screw driver tighten command timeout", capture)
+
+    def loosen(self, t_index, force, screw_len, f_wait=True, capture=False):
+        '''
+        Starts a screw loosening command\n
+        With capture the trace columns are SD_TRACE_COLUMNS
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @param force:  Screw loosen force in N (18-30)
+        @type force: int
+        @param screw_len: Length of the screw in mm (0-35)
+        @type screw_len: float
+        @param f_wait: Wait for command to finish or not?
+        @type f_wait: bool
+        @param capture: Capture the torque/shank trace while waiting and return (result, trace),
+        trace is None if the command was not started
+        @type capture: bool
+        '''
+        if self.isConnected(t_index) is False:
+            return self._result(CONN_ERR, capture)
+
+        #Sanity check
+        if force < 18 or force > 30:
+            print("Invalid force parameter for loosen command, valid range: 18-30")
+            return self._result(RET_FAIL, capture)
+
+        if screw_len < 0.0 or screw_len > 35.0:
+            print("Invalid screw length for loosen command, valid range: 0-35")
+            return self._result(RET_FAIL, capture)
+
+        self.cb.sd_loosen(t_index, int(force), float(screw_len))
+
+        return self._finish(t_index, f_wait, 100, "Screw driver loosen command timeout", capture)
+
+    def pickup_screw(self, t_index, zforce, screw_len, f_wait=True, capture=False):
+        '''
+        Starts a screw pickup command\n
+        With capture the trace columns are SD_TRACE_COLUMNS
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @param zforce:  Screw pickup force in N (18-30)
+        @type zforce: int
+        @param screw_len: Length of the screw in mm (0-35)
+        @type screw_len: float
+        @param f_wait: Wait for command to finish or not?
+        @type f_wait: bool
+        @param capture: Capture the torque/shank trace while waiting and return (result, trace),
+        trace is None if the command was not started
+        @type capture: bool
+        '''
+        #Sanity check
+        if zforce < 18 or zforce > 30:
+            print("Invalid zforce parameter for pickup screw command, valid range: 18-30")
+            return self._result(RET_FAIL, capture)
+
+        if screw_len < 0.0 or screw_len > 35.0:
+            print("Invalid screw length for pickup screw command, valid range: 0-35")
+            return self._result(RET_FAIL, capture)
+
+        self.cb.sd_pickup_screw(t_index, int(zforce), float(screw_len))
+
+        return self._finish(t_index, f_wait, 100, "Screw driver pickup screw command timeout", capture)
+
+    def move_shank(self, t_index, shank_pos, f_wait=True):
+        '''
+        Moves the shank to the given position
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @param shank_pos:  Shank position in mm (0-55)
+        @type shank_pos: int
+        @param f_wait: Wait for command to finish or not?
+        @type f_wait: bool
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        #Sanity check
+        if shank_pos < 0 or shank_pos > 55:
+            print("Invalid shank position parameter for move shank command, valid range: 0-55")
+            return RET_FAIL
+
+        self.cb.sd_move_shank(t_index, int(shank_pos))
+
+        return self._finish(t_index, f_wait, 30, "Screw driver move shank command timeout", False)
+
+    #Private function
+    def _wait_status(self, t_index, max_cnt, timeout_msg, period):
+        '''
+        Polls the busy flags, error code and command result in one batched read per period
+
+        @return: (True if timed out, CONN_ERR if the read failed, False otherwise; error code; command result)
+        @rtype: tuple
+        '''
+        deadline = time.perf_counter() + max_cnt * 0.1
+        while True:
+            multi = xmlrpc.client.MultiCall(self.cb)
+            multi.sd_get_shank_busy(t_index)
+            multi.sd_get_screwdriver_busy(t_index)
+            multi.sd_get_error_code(t_index)
+            multi.sd_get_command_results(t_index)
+            #The getters fault if the device drops during the command
+            try:
+                shank_busy, dev_busy, err_code, cmd_result = multi()
+            except xmlrpc.client.Fault as e:
+                print("Failed to read Screw driver: " + str(e.faultString))
+                return CONN_ERR, None, None
+            if not shank_busy and not dev_busy:
+                return False, err_code, cmd_result
+            if time.perf_counter() > deadline:
+                print(timeout_msg)
+                return True, err_code, cmd_result
+            if wait(period):
+                return True, err_code, cmd_result
+
+    #Private function, result code of a pickup or tighten of run_job from the _wait_status values
+    def _job_step(self, t_index, timeout, err_code, cmd_result):
+        if timeout == CONN_ERR:
+            return CONN_ERR
+        if timeout:
+            return RET_FAIL
+        if self.err_h[t_index] and self._decode_err(err_code, cmd_result)['error']:
+            return RET_FAIL
+        return RET_OK
+
+    def run_job(self, t_index, screws, move_to_screw=None, move_to_feeder=None, period=0.02, stop_on_error=True):
+        '''
+        Runs pickup_screw, robot move and tighten for every screw of a job\n
+        Each screw is a dictionary with the keys 'force', 'screw_len', 'torq' and optionally 'zforce'
+        (pickup force, defaults to force). The callbacks are called with the screw index and
+        dictionary: move_to_screw after the pickup, move_to_feeder after the tighten except for the last screw\n
+        The returned dictionary is indexed with ['results', 'times', 'mean', 'max'],
+        the timing columns are SD_JOB_COLUMNS and the statistics cover the successful screws.
+        The result of a screw is RET_OK, RET_FAIL, CONN_ERR if the device dropped during it,
+        or SD_JOB_SKIPPED if the job stopped before it
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @param screws: List of screw dictionaries
+        @type screws: list
+        @param move_to_screw: Robot motion from the feeder to the screw hole
+        @param move_to_feeder: Robot motion from the screw hole back to the feeder
+        @param period: Status polling period in seconds
+        @type period: float
+        @param stop_on_error: Stop the job at the first failed screw or not?
+        @type stop_on_error: bool
+        @return: Job result dictionary
+        @rtype: dict
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        #Sanity check all screws before starting
+        for spec in screws:
+            zforce = spec.get('zforce', spec['force'])
+            if spec['force'] < 18 or spec['force'] > 30 or zforce < 18 or zforce > 30:
+                print("Invalid force parameter in screw job, valid range: 18-30")
+                return RET_FAIL
+            if spec['screw_len'] < 0.0 or spec['screw_len'] > 35.0:
+                print("Invalid screw length in screw job, valid range: 0-35")
+                return RET_FAIL
+            if spec['torq'] < 0.0 or spec['torq'] > 5.0:
+                print("Invalid torque parameter in screw job, valid range: 0-5")
+                return RET_FAIL
+
+        results = np.full(len(screws), SD_JOB_SKIPPED, dtype=int)
+        times = np.full((len(screws), len(SD_JOB_COLUMNS)), np.nan)
+
+        for i, spec in enumerate(screws):
+            start = time.perf_counter()
+
+            self.cb.sd_pickup_screw(t_index, int(spec.get('zforce', spec['force'])), float(spec['screw_len']))
+            res = self._job_step(t_index, *self._wait_status(t_index, 100, "Screw driver pickup screw command timeout", period))
+            picked = time.perf_counter()
+            times[i, 0] = picked - start
+
+            if res == RET_OK:
+                if move_to_screw is not None:
+                    move_to_screw(i, spec)
+                moved = time.perf_counter()
+                times[i, 1] = moved - picked
+
+                self.cb.sd_tighten(t_index, int(spec['force']), float(spec['screw_len']), float(spec['torq']))
+                res = self._job_step(t_index, *self._wait_status(t_index, 300, "Screw driver tighten command timeout", period))
+                times[i, 2] = time.perf_counter() - moved
+
+            results[i] = res
+            times[i, 3] = time.perf_counter() - start
+
+            #The job cannot go on without the device
+            if res == CONN_ERR or (res != RET_OK and stop_on_error):
+                break
+            if move_to_feeder is not None and i < len(screws) - 1:
+                move_to_feeder(i, spec)
+
+        #Statistics over the completed screws only
+        done = times[results == RET_OK]
+        if len(done) == 0:
+            done = np.full((1, len(SD_JOB_COLUMNS)), np.nan)
+        return {'results': results, 'times': times, 'mean': done.mean(axis=0), 'max': done.max(axis=0)}
+
+    def halt(self, t_index=0):
+        '''
+        Stops the Screw driver
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        '''
+        self.cb.sd_stop(t_index)
+
+    def resetpower(self, t_index=0):
+        '''
+        Resets the power of the grippers\n
+        Needs to be issued after saftey event
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+        self.cb.cb_reset_tool_power()
+
+
+if __name__ == '__main__':
+    device = Device()
+    screwdriver = SD(device)
+    print("Connection check: ", screwdriver.isConnected())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from sd import SD_TRACE_COLUMNS
+
+'''
+Screw outcome classification over torque versus shank position traces captured
+with SD.tighten(..., capture=True)
+
+Traces are padded into (traces, samples) arrays so that every feature is computed
+for all traces at once
+'''
+
+#Screw outcome classes
+SCREW_OK = 0
+SCREW_CROSS_THREAD = 1
+SCREW_STRIPPED = 2
+SCREW_SHORT = 3
+SCREW_NO_SCREW = 4
+
+SCREW_CLASSES = ('OK', 'cross-thread', 'stripped', 'short', 'no screw')
+
+TORQUE_COL = SD_TRACE_COLUMNS.index('torque')
+SHANK_COL = SD_TRACE_COLUMNS.index('shank_pos')
+
+
+def pack_traces(traces):
+    '''
+    Packs a list of captured traces into NaN padded torque and shank position arrays
+
+    @param traces: List of arrays with SD_TRACE_COLUMNS columns
+    @type traces: list
+    @return: (torque, shank position, lengths), arrays of shape (traces, longest trace) and (traces,)
+    @rtype: tuple
+    '''
+    lengths = np.fromiter((len(t) for t in traces), dtype=int, count=len(traces))
+    width = max(int(lengths.max()) if len(traces) else 0, 1)
+    torque = np.full((len(traces), width), np.nan)
+    shank = np.full((len(traces), width), np.nan)
+    for i, t in enumerate(traces):
+        torque[i, :lengths[i]] = t[:, TORQUE_COL]
+        shank[i, :lengths[i]] = t[:, SHANK_COL]
+    return torque, shank, lengths
+
+
+def extract_features(torque, shank, lengths):
+    '''
+    Computes the classification features of packed traces\n
+    The returned dictionary is indexed with ['peak', 'final', 'travel', 'running']
+    where running is the mean torque over the first half of the shank travel
+
+    @param torque: Padded torque array in Nm
+    @param shank: Padded shank position array in mm
+    @param lengths: Number of valid samples per trace
+    @return: Dictionary of per trace feature arrays
+    @rtype: dict
+    '''
+    rows = np.arange(len(lengths))
+    valid = np.arange(torque.shape[1]) < lengths[:, None]
+    last = np.maximum(lengths - 1, 0)
+
+    tq = np.where(valid, torque, -np.inf)
+    peak = tq.max(axis=1)
+    final = torque[rows, last]
+
+    progress = np.abs(shank - shank[:, :1])
+    travel = np.where(valid, progress, -np.inf).max(axis=1)
+
+    early = valid & (progress <= 0.5 * travel[:, None])
+    cnt = early.sum(axis=1)
+    running = np.where(early, torque, 0.0).sum(axis=1) / np.maximum(cnt, 1)
+
+    empty = lengths == 0
+    peak[empty] = 0.0
+    final[empty] = 0.0
+    travel[empty] = 0.0
+    running[empty] = 0.0
+
+    return {'peak': peak, 'final': final, 'travel': travel, 'running': running}
+
+
+def classify(traces, torq, screw_len, reach=0.9, no_screw=0.1, strip=0.5, short=0.8, cross=0.3):
+    '''
+    Classifies screw outcomes from captured tighten traces
+
+    @param traces: List of arrays with SD_TRACE_COLUMNS columns
+    @type traces: list
+    @param torq: Target torque in Nm, scalar or one per trace
+    @param screw_len: Screwing length in mm, scalar or one per trace
+    @param reach: Fraction of the target torque counting as reached
+    @param no_screw: Peak torque fraction below which no screw was driven
+    @param strip: Final/peak torque fraction below which the thread stripped
+    @param short: Travel fraction of the screw length below which the screw seated short
+    @param cross: Running torque fraction of the target indicating a cross-thread
+    @return: Class per trace, one of SCREW_OK, SCREW_CROSS_THREAD, SCREW_STRIPPED, SCREW_SHORT, SCREW_NO_SCREW
+    @rtype: numpy.ndarray
+    '''
+    f = extract_features(*pack_traces(traces))
+    torq = np.broadcast_to(np.asarray(torq, dtype=float), f['peak'].shape)
+    screw_len = np.broadcast_to(np.asarray(screw_len, dtype=float), f['peak'].shape)
+
+    reached = f['peak'] >= reach * torq
+
+    #First matching condition wins
+    return np.select(
+        [f['peak'] < no_screw * torq,
+         (f['final'] < strip * f['peak']) | ~reached,
+         f['travel'] < short * screw_len,
+         f['running'] > cross * torq],
+        [SCREW_NO_SCREW, SCREW_STRIPPED, SCREW_SHORT, SCREW_CROSS_THREAD],
+        default=SCREW_OK)
+
+
+def summary(classes):
+    '''
+    Counts the outcomes of classified screws
+
+    @param classes: Result of classify()
+    @return: Dictionary indexed by the SCREW_CLASSES names
+    @rtype: dict
+    '''
+    counts = np.bincount(classes, minlength=len(SCREW_CLASSES))
+    return dict(zip(SCREW_CLASSES, counts.tolist()))
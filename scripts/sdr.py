@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+import xmlrpc.client
+from device import Device, Sampler, wait
+import numpy as np
+
+'''
+XML-RPC library for controlling OnRobot devcies from Doosan robots
+
+Global_cbip holds the IP address of the compute box, needs to be defined by the end user
+'''
+
+#Device IDs
+SDR_ID = 0xB0
+
+# Connection
+CONN_ERR = -2   # Connection failure
+RET_OK = 0      # Okay
+RET_FAIL = -1   # Error
+
+#Columns of a monitor trace and the XML-RPC getters behind them (time is local)
+SDR_TRACE_COLUMNS = ('time', 'rpm', 'running', 'ramping_up', 'ramping_down', 'stopped')
+SDR_TRACE_CALLS = ('sdr_get_current_rpm', 'sdr_get_motor_running', 'sdr_get_motor_ramping_up',
+                   'sdr_get_motor_ramping_down', 'sdr_get_motor_stopped')
+
+#Columns of the telemetry stream and the XML-RPC getters behind them (time is local)
+SDR_TELEMETRY_COLUMNS = ('time', 'rpm', 'temp', 'warning')
+SDR_TELEMETRY_CALLS = ('sdr_get_current_rpm', 'sdr_get_current_temp_c', 'sdr_get_warning')
+
+
+class SDR():
+    '''
+    This class is for handling the Sander device
+    '''
+    cb = None
+
+    def __init__(self, dev):
+        #Mask for power supply warning
+        self.PS_MASK = 0x20
+        self.cb = dev.getCB()
+        #Trace of the last setRPM wait, columns are SDR_TRACE_COLUMNS
+        self.trace = np.zeros((0, len(SDR_TRACE_COLUMNS)))
+        self._trace = np.zeros((1000, len(SDR_TRACE_COLUMNS)))
+
+    def isConnected(self):
+        '''
+        Returns with True if a Sander device is connected, False otherwise
+
+        @return: True if connected, False otherwise
+        @rtype: bool
+        '''
+        IsSDR = self.cb.cb_is_device_connected(0, SDR_ID)
+        if IsSDR is False:
+            print("No Sander device connected")
+            return False
+        else:
+            #Check power supply
+            warn_field = self.cb.sdr_get_warning(0)
+            ps_f = warn_field & self.PS_MASK
+            if ps_f != 0:
+                print("Sander external power supply is not connected!")
+                return False
+            else:
+                return True
+
+    def get_warning(self):
+        '''
+        Returns with warning code of the Sander
+
+        @return: Warning code, 0 means no warnings
+        @rtype: int
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.sdr_get_warning(0)
+
+    def isRunning(self):
+        '''
+        Returns with True if the Sander is running
+
+        @return: True if motor is running, False otherwise
+        @rtype: bool
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.sdr_get_motor_running(0)
+
+    def isRampingUp(self):
+        '''
+        Returns with True if the Sander is ramping up
+
+        @return: True if motor is ramping up, False otherwise
+        @rtype: bool
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.sdr_get_motor_ramping_up(0)
+
+    def isRampingDown(self):
+        '''
+        Returns with True if the Sander is ramping down
+
+        @return: True if motor is ramping down, False otherwise
+        @rtype: bool
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.sdr_get_motor_ramping_down(0)
+
+    def isStopped(self):
+        '''
+        Returns with True if the Sander is stopped
+
+        @return: True if motor is stopped, False otherwise
+        @rtype: bool
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.sdr_get_motor_stopped(0)
+
+    def isBtnPressed(self):
+        '''
+        Returns with True if the Sander button is pressed
+
+        @return: True if button is pressed, False otherwise
+        @rtype: bool
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.sdr_get_button_pressed(0)
+
+    def getTemp(self):
+        '''
+        Returns with the current temperature of the Sander
+
+        @return: Temperature in Celsius
+        @rtype: float
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.sdr_get_current_temp_c(0)
+
+    def getRPM(self):
+        '''
+        Returns with the current rotational speed of the Sander
+
+        @return: Speed in RPM
+        @rtype: int
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        return self.cb.sdr_get_current_rpm(0)
+
+    def monitor(self, done, timeout, period=0.05):
+        '''
+        Samples RPM and motor state at a fixed rate with one batched read per sample
+        until done returns True or the timeout elapses\n
+        The samples are stored in self.trace, columns are SDR_TRACE_COLUMNS
+
+        @param done: Called with each sample row, returns True to stop monitoring
+        @param timeout: Maximum monitoring time in seconds
+        @type timeout: float
+        @param period: Sampling period in seconds
+        @type period: float
+        @return: True if done was reached, False on timeout or abort
+        @rtype: bool
+        '''
+        buf = self._trace
+        start = time.perf_counter()
+        next_tick = start
+        count = 0
+        reached = False
+        while True:
+            multi = xmlrpc.client.MultiCall(self.cb)
+            for call in SDR_TRACE_CALLS:
+                getattr(multi, call)(0)
+            row = (time.perf_counter() - start,) + tuple(multi())
+            if count < len(buf):
+                buf[count] = row
+                count += 1
+            if done(row):
+                reached = True
+                break
+            if row[0] > timeout:
+                break
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay <= 0:
+                next_tick = time.perf_counter()
+            if wait(max(delay, 0)):
+                break
+
+        self.trace = buf[:count].copy()
+        return reached
+
+    def setRPM(self, setRPM, f_wait=True, band=0.05, timeout=6.0):
+        '''
+        Starts or stops the Sander
+
+        @param setRPM: The desired Speed of the sander\n
+        1000-10000 Starts the Sander at the given RPM, anything below 1000 stops the Sander
+        @type setRPM: int (0-10000)
+        @type f_wait: bool
+        @param f_wait: wait for the command to end or not?
+        @param band: Relative RPM band around setRPM that counts as reached when waiting
+        @type band: float
+        @param timeout: Maximum wait in seconds
+        @type timeout: float
+        '''
+        if self.isConnected() is False:
+            return CONN_ERR
+
+        if setRPM < 0 or setRPM > 10000:
+            print("Invalid parameter for Sander RPM, 0-10000 is the valid range")
+            return RET_FAIL
+
+        # Under 1000 rpm we will stop the sander
+        if setRPM >= 1000 and setRPM <= 10000:
+
+            self.cb.sdr_start(0, int(setRPM))
+
+            if f_wait:
+                #Running, not ramping and in the target band
+                def in_band(row):
+                    return (row[2] and not row[3] and not row[4]
+                            and abs(row[1] - setRPM) <= band * setRPM)
+
+                if self.monitor(in_band, timeout):
+                    return RET_OK
+                print("Sander start command timeout")
+                return RET_FAIL
+            else:
+                return RET_OK
+
+        elif setRPM < 1000:
+
+            self.cb.sdr_stop(0)
+
+            if f_wait:
+                if self.monitor(lambda row: row[5], timeout):
+                    return RET_OK
+                print("Sander stop command timeout")
+                return RET_FAIL
+            else:
+                return RET_OK
+
+
+class SDRTelemetry(Sampler):
+    '''
+    This class streams the Sander RPM and temperature in the background\n
+    Each tick is one batched read stored in a time-indexed ring buffer, and mean/min/max
+    of RPM and temperature are kept online for the current sanding pass
+    '''
+
+    def __init__(self, dev, period=0.05, capacity=72000):
+        '''
+        @param dev: Device object
+        @param period: Sampling period in seconds
+        @type period: float
+        @param capacity: Number of samples kept, the oldest are overwritten
+        @type capacity: int
+        '''
+        Sampler.__init__(self, period)
+        self.sander = SDR(dev)
+        self._data = np.zeros((int(capacity), len(SDR_TELEMETRY_COLUMNS)), dtype=np.float32)
+        self._count = 0
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._pass_start = None
+        self._pass_stats()
+
+    #Private method, clears the online statistics of RPM and temperature
+    def _pass_stats(self):
+        self._n = 0
+        self._sum = np.zeros(2)
+        self._min = np.full(2, np.inf)
+        self._max = np.full(2, -np.inf)
+
+    def sample(self):
+        '''
+        Reads RPM, temperature and warning code in one batched round trip and stores them
+
+        @return: Sample row, columns are SDR_TELEMETRY_COLUMNS
+        @rtype: numpy.ndarray
+        '''
+        multi = xmlrpc.client.MultiCall(self.sander.cb)
+        for call in SDR_TELEMETRY_CALLS:
+            getattr(multi, call)(0)
+        rpm, temp, warn = multi()
+        with self._lock:
+            row = self._data[self._count % len(self._data)]
+            row[:] = (time.perf_counter() - self._t0, rpm, temp, warn)
+            self._count += 1
+            if self._pass_start is not None:
+                val = row[1:3]
+                self._n += 1
+                self._sum += val
+                np.minimum(self._min, val, out=self._min)
+                np.maximum(self._max, val, out=self._max)
+            return row.copy()
+
+    def data(self):
+        '''
+        Returns with the stored samples, oldest first
+
+        @return: Array of samples, columns are SDR_TELEMETRY_COLUMNS, time in seconds since start()
+        @rtype: numpy.ndarray
+        '''
+        with self._lock:
+            n = min(self._count, len(self._data))
+            idx = (self._count - n + np.arange(n)) % len(self._data)
+            return self._data[idx]
+
+    def start_pass(self):
+        '''
+        Starts the statistics of a new sanding pass
+        '''
+        with self._lock:
+            self._pass_stats()
+            self._pass_start = time.perf_counter()
+
+    def end_pass(self):
+        '''
+        Ends the current sanding pass and returns with its statistics\n
+        The dictionary is indexed with ['samples', 'duration', 'rpm', 'temp'],
+        rpm and temp are (mean, min, max) tuples
+
+        @return: Pass statistics, None if no pass was started
+        @rtype: dict
+        '''
+        with self._lock:
+            if self._pass_start is None:
+                return None
+            duration = time.perf_counter() - self._pass_start
+            self._pass_start = None
+            mean = self._sum / max(self._n, 1)
+            return {'samples': self._n, 'duration': duration,
+                    'rpm': (mean[0], self._min[0], self._max[0]),
+                    'temp': (mean[1], self._min[1], self._max[1])}
+
+    def start(self):
+        '''
+        Clears the stored samples and starts streaming in a background thread
+        '''
+        if self.isRunning():
+            return RET_FAIL
+        if self.sander.isConnected() is False:
+            return CONN_ERR
+        with self._lock:
+            self._count = 0
+            self._t0 = time.perf_counter()
+        self._start()
+        return RET_OK
+
+
+if __name__ == '__main__':
+    device = Device()
+    sander = SDR(device)
+    print("Connection check: ", sander.isConnected())
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 import time
-from device import Device
+from device import Device, wait
 import numpy as np
 
 '''
@@ -191,7 +191,8 @@ class TWOFG():
             tim_cnt = 0
             fbusy = self.isBusy(t_index)
             while (fbusy):
-                time.sleep(0.1)
+                if wait(0.1):
+                    break
                 fbusy = self.isBusy(t_index)
                 tim_cnt += 1
                 if tim_cnt > 30:
@@ -202,7 +203,8 @@ class TWOFG():
                 grip_tim = 0
                 gripped = self.isGripped(t_index)
                 while (not gripped):
-                    time.sleep(0.1)
+                    if wait(0.1):
+                        break
                     gripped = self.isGripped(t_index)
                     grip_tim += 1
                     if grip_tim > 20:
@@ -240,7 +242,8 @@ class TWOFG():
             tim_cnt = 0
             fbusy = self.isBusy(t_index)
             while (fbusy):
-                time.sleep(0.1)
+                if wait(0.1):
+                    break
                 fbusy = self.isBusy(t_index)
                 tim_cnt += 1
                 if tim_cnt > 30:
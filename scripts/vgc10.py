@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 
 import time
-from device import Device
+from collections import deque
+from device import Device, wait
 import numpy as np
 
 '''
@@ -64,7 +65,8 @@ class VG():
             vacA = self.getvacA(t_index)
             vacB = self.getvacB(t_index)
             while ((vacuumA > vacA) or (vacuumB > vacB)):
-                time.sleep(0.1)
+                if wait(0.1):
+                    break
                 vacA = self.getvacA(t_index)
                 vacB = self.getvacB(t_index)
                 tim_cnt += 1
@@ -105,7 +107,8 @@ class VG():
                 tim_cnt = 0
                 vacA = self.getvacA(t_index)
                 while (0.1 < vacA):
-                    time.sleep(0.1)
+                    if wait(0.1):
+                        break
                     vacA = self.getvacA(t_index)
                     tim_cnt += 1
                     if tim_cnt > 40:
@@ -119,7 +122,8 @@ class VG():
                 tim_cnt = 0
                 vacB = self.getvacB(t_index)
                 while (0.1 < vacB):
-                    time.sleep(0.1)
+                    if wait(0.1):
+                        break
                     vacB = self.getvacB(t_index)
                     tim_cnt += 1
                     if tim_cnt > 40:
@@ -134,7 +138,8 @@ class VG():
                 vacA = self.getvacA(t_index)
                 vacB = self.getvacB(t_index)
                 while ((0.1 < vacB) or (0.1 < vacA)):
-                    time.sleep(0.1)
+                    if wait(0.1):
+                        break
                     vacA = self.getvacA(t_index)
                     vacB = self.getvacB(t_index)
                     tim_cnt += 1
@@ -198,6 +203,168 @@ class VG():
         self.cb.vg10_idle(t_index, channelA, channelB)
 
 
+class GripTuner():
+    '''
+    This class records the vacuum build-up curve of VGC10 grips per part ID and
+    recommends the lowest vacuum level and shortest wait that held the part reliably\n
+    Below the lowest reliable level the next lower level is tried, until it is proven
+    or fails to hold the part
+    '''
+
+    def __init__(self, gripper, min_trials=5, reliability=1.0, period=0.02, window=50, step=5.0):
+        '''
+        @param gripper: VG object used for the grips
+        @param min_trials: Number of reported grips a level needs before it can be recommended
+        @type min_trials: int
+        @param window: Number of reported grips kept per part and level, the oldest are dropped
+        @type window: int
+        @param reliability: Fraction of reported grips that must have held the part
+        @type reliability: float
+        @param period: Sampling period of the build-up curve in seconds
+        @type period: float
+        @param step: Vacuum level decrease in kPa to try below the lowest reliable level, 0 to not try lower levels
+        @type step: float
+        '''
+        self.gripper = gripper
+        self.min_trials = int(min_trials)
+        self.reliability = float(reliability)
+        self.period = float(period)
+        self.window = int(window)
+        self.step = float(step)
+        #Indexed by the part ID, each entry is a dictionary with the unreported 'last' grip
+        #record (curve included) and per vacuum level a window of (build_time, held) tuples
+        self.history = {}
+
+    def grip(self, part_id, t_index=0, vacuumA=1, vacuumB=1, auto=False, timeout=4.0):
+        '''
+        Starts a grip and records the vacuum-versus-time curve until both channels
+        reach the requested level\n
+        With auto set the recommended level and wait of the part are used when available
+
+        @param part_id: Caller supplied part identifier
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @param vacuumA: The desired vacuum level on channel A, between 1-80 kPa
+        @param vacuumB: The desired vacuum level on channel B, between 1-80 kPa
+        @type auto: bool
+        @param auto: Apply the recommended level and wait or not?
+        @param timeout: Maximum build-up time in seconds
+        @type timeout: float
+        '''
+        wait_time = 0.0
+        if auto:
+            rec = self.recommend(part_id)
+            if rec is not None:
+                vacuumA, vacuumB, wait_time = rec
+
+        if self.gripper.grip(t_index, vacuumA, vacuumB, False) == CONN_ERR:
+            return CONN_ERR
+
+        cb = self.gripper.cb
+        n = int(timeout / self.period) + 2
+        curve = np.zeros((n, 3))
+        start = time.perf_counter()
+        #Nothing to poll for before the level is expected to be reached
+        if wait_time > self.period:
+            if wait(wait_time - self.period):
+                print("VG grip command aborted")
+                return RET_FAIL
+
+        count = 0
+        res = RET_FAIL
+        aborted = False
+        while count < n:
+            vacAB = cb.vg10_get_all_double_variables(t_index)
+            curve[count] = (time.perf_counter() - start, vacAB[0], vacAB[1])
+            count += 1
+            if vacAB[0] >= vacuumA and vacAB[1] >= vacuumB:
+                res = RET_OK
+                break
+            if curve[count - 1, 0] > timeout:
+                break
+            if wait(self.period):
+                aborted = True
+                break
+
+        #An aborted grip tells nothing about the build-up, it is not recorded
+        if aborted:
+            print("VG grip command aborted")
+            return RET_FAIL
+
+        if res != RET_OK:
+            #Turn off channel that could not reach the level
+            if curve[count - 1, 1] < vacuumA:
+                self.gripper.release(t_index, True, False, False)
+            if curve[count - 1, 2] < vacuumB:
+                self.gripper.release(t_index, False, True, False)
+            print("Timeout during VG grip command")
+
+        entry = self.history.setdefault(part_id, {'last': None, 'levels': {}})
+        entry['last'] = {
+            'level': (vacuumA, vacuumB),
+            'curve': curve[:count],
+            'build_time': curve[count - 1, 0] if res == RET_OK else None,
+        }
+        return res
+
+    def report(self, part_id, held):
+        '''
+        Reports if the part of the last recorded grip was held until its release
+
+        @param part_id: Caller supplied part identifier
+        @type held: bool
+        @param held: True if the part was held, False if it was dropped
+        '''
+        entry = self.history.get(part_id)
+        if entry is None or entry['last'] is None:
+            return RET_FAIL
+        rec = entry['last']
+        entry['last'] = None
+        #Only the build time and the outcome are kept once the grip is reported
+        if rec['level'] not in entry['levels']:
+            entry['levels'][rec['level']] = deque(maxlen=self.window)
+        entry['levels'][rec['level']].append((rec['build_time'], bool(held)))
+        return RET_OK
+
+    def recommend(self, part_id):
+        '''
+        Returns with the lowest recorded vacuum level that held the part reliably and
+        the wait needed to build it\n
+        While the next lower level is not proven or failed yet, that level is returned
+        with the wait of the reliable one
+
+        @param part_id: Caller supplied part identifier
+        @rtype: tuple
+        @return: (vacuumA, vacuumB, wait in seconds), None if no level qualifies yet
+        '''
+        entry = self.history.get(part_id)
+        if entry is None:
+            return None
+
+        best = None
+        for level, recs in entry['levels'].items():
+            held = np.array([h and b is not None for b, h in recs])
+            #A level that never held has no build time to recommend
+            if len(recs) < self.min_trials or not held.any() or held.mean() < self.reliability:
+                continue
+            if best is None or sum(level) < sum(best[0]):
+                best = (level, recs)
+
+        if best is None:
+            return None
+        level, recs = best
+        build = np.array([b for b, h in recs if b is not None])
+        wait_time = float(build.max())
+
+        #The build-up of a lower level is not longer, the wait of the reliable level is kept
+        lower = (max(level[0] - self.step, 1), max(level[1] - self.step, 1))
+        if self.step > 0 and lower != level:
+            recs = entry['levels'].get(lower, ())
+            held = [h and b is not None for b, h in recs]
+            if len(held) < self.min_trials and (not held or np.mean(held) >= self.reliability):
+                return lower[0], lower[1], wait_time
+        return level[0], level[1], wait_time
+
+
 if __name__ == "__main__":
     device = Device()
     gripper_vgc10 = VG(device)
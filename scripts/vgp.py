@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+import xmlrpc.client
+from device import Device, Sampler, wait
+import numpy as np
+
+'''
+XML-RPC library for controlling OnRobot devcies from Doosan robots
+
+Global_cbip holds the IP address of the compute box, needs to be defined by the end user
+'''
+
+#Device IDs
+VGP_ID = 0x18
+
+# Connection
+CONN_ERR = -2   # Connection failure
+RET_OK = 0      # Okay
+RET_FAIL = -1   # Error
+
+#Per channel XML-RPC getters, in channel order A, B, C, D
+VGP_CHANNELS = (0x01, 0x02, 0x04, 0x08)
+VGP_VACUUM_CALLS = ('vgp_get_vacuum_a_percent', 'vgp_get_vacuum_b_percent',
+                    'vgp_get_vacuum_c_percent', 'vgp_get_vacuum_d_percent')
+VGP_GRIP_CALLS = ('vgp_get_grip_status_a', 'vgp_get_grip_status_b',
+                  'vgp_get_grip_status_c', 'vgp_get_grip_status_d')
+VGP_RELEASE_CALLS = ('vgp_get_release_status_a', 'vgp_get_release_status_b',
+                     'vgp_get_release_status_c', 'vgp_get_release_status_d')
+
+
+class VGP():
+    '''
+    This class is for handling VGP device
+    '''
+    cb = None
+
+    def __init__(self, dev):
+        #To hold values before calling grip
+        #Indexed by the tool index (single, pri, sec)
+        self.required_channels = [0,0,0]
+        self.enabled_channels = [0,0,0]
+        #To identify channels
+        self.ALL_CH = 0x0F
+        self.A_CH = 0x01
+        self.B_CH = 0x02
+        self.C_CH = 0x04
+        self.D_CH = 0x08
+        self.cb = dev.getCB()
+
+    def isConnected(self, t_index=0):
+        '''
+        Returns with True if a VGP device is connected, False otherwise
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @return: True if connected, False otherwise
+        @rtype: bool
+        '''
+        IsVGP = self.cb.cb_is_device_connected(t_index, VGP_ID)
+        if IsVGP is False:
+            print("No VGP connected on the given instance")
+            return False
+        else:
+            return True
+
+    def check_QC(self, t_index=0):
+        '''
+        Returns with True if there is a Quick connector error with the device\n
+        Should always be used with a High Power Quick Changer
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @return: True if QC error, False otherwise
+        @rtype: bool
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self.cb.vgp_get_error_qc(t_index)
+
+    def check_PSU(self, t_index=0):
+        '''
+        Returns with True if there is a PSU error with the device
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @return: True if PSU error, False otherwise
+        @rtype: bool
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self.cb.vgp_get_error_psu(t_index)
+
+    def isBusy(self, t_index=0):
+        '''
+        Gets if the gripper is busy or not
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+
+        @rtype: bool
+        @return: True if busy, False otherwise
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self.cb.vgp_get_busy(t_index)
+
+    #Private method
+    def _get_channel(self, t_index, chID, calls):
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        if chID not in VGP_CHANNELS:
+            print("Channel parameter needs to be vgp.A_CH or B_CH or C_CH or D_CH")
+            return RET_FAIL
+
+        return getattr(self.cb, calls[VGP_CHANNELS.index(chID)])(t_index)
+
+    def get_vacuum(self, t_index, chID):
+        '''
+        Gets the current vacuum level for the given channel\n
+        Channel needs to be vgp.A_CH, vgp.B_CH, vgp.C_CH or vgp.D_CH
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+
+        @rtype: int
+        @return: Vacuum percentage
+        '''
+        return self._get_channel(t_index, chID, VGP_VACUUM_CALLS)
+
+    def get_release_status(self, t_index, chID):
+        '''
+        Gets the release status for the given channel\n
+        Channel needs to be vgp.A_CH, vgp.B_CH, vgp.C_CH or vgp.D_CH
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+
+        @rtype: int
+        @return: Release status\n
+        0 means not released
+        1 means Release OK
+        2 means Release Failed
+        '''
+        return self._get_channel(t_index, chID, VGP_RELEASE_CALLS)
+
+    def get_grip_status(self, t_index, chID):
+        '''
+        Gets the grip status for the given channel\n
+        Channel needs to be vgp.A_CH, vgp.B_CH, vgp.C_CH or vgp.D_CH
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+
+        @rtype: int
+        @return: Release status\n
+        0 means not gripped
+        1 means grip detected
+        2 means grip timeout
+        3 means grip lost
+        '''
+        return self._get_channel(t_index, chID, VGP_GRIP_CALLS)
+
+    def get_channels(self, t_index=0, chmask=0x0F):
+        '''
+        Gets vacuum, grip status and release status of the channels in the mask
+        with a single batched XML-RPC round trip\n
+        Rows are [vacuum %, grip status, release status], columns are the
+        selected channels in A, B, C, D order
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @param chmask: Channel mask, vgp.ALL_CH or combination of vgp.A_CH, B_CH, C_CH, D_CH
+        @type chmask: int
+
+        @rtype: numpy.ndarray
+        @return: Array of shape (3, selected channels), the statuses are whole numbers
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self._read_channels(t_index, chmask, (VGP_VACUUM_CALLS, VGP_GRIP_CALLS, VGP_RELEASE_CALLS))
+
+    def get_vacuums(self, t_index=0, chmask=0x0F):
+        '''
+        Gets the vacuum level of the channels in the mask with a single batched XML-RPC round trip
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @param chmask: Channel mask, vgp.ALL_CH or combination of vgp.A_CH, B_CH, C_CH, D_CH
+        @type chmask: int
+
+        @rtype: numpy.ndarray
+        @return: Vacuum percentages of the selected channels in A, B, C, D order
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        return self._read_channels(t_index, chmask, (VGP_VACUUM_CALLS,))[0]
+
+    #Private method, no connection check
+    def _read_channels(self, t_index, chmask, tables):
+        idx = [i for i, ch in enumerate(VGP_CHANNELS) if chmask & ch]
+        multi = xmlrpc.client.MultiCall(self.cb)
+        for calls in tables:
+            for i in idx:
+                getattr(multi, calls[i])(t_index)
+        #Float for every table, the vacuum may be fractional and the status codes stay exact
+        res = np.fromiter(multi(), dtype=float, count=len(idx) * len(tables))
+        return res.reshape(len(tables), len(idx))
+
+    #Set required channels to be used for grip
+    #Can be called with arbitrary channels
+    #Example1: vgp.set_timeout(0, vgp.A_CH, vgp.B_CH) set A and B to time out
+    #Example2: vgp.set_timeout(0, vgp.B_CH) set only B to time out
+    #Example3: vgp.set_timeout(0, vgp.CH_ALL) set all channels to time out
+    def set_timeout(self, t_index, *reqch):
+        '''
+        Sets the channels to be monitored for timeout during the grip\n
+        Channel can be vgp.A_CH, vgp.B_CH, vgp.C_CH, vgp.D_CH, vgp.ALL_CH or combinations of those
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        '''
+        if len(reqch) == 0:
+            print("No channel parameter given to set timeout")
+            return RET_FAIL
+
+        if len(reqch) > 4:
+            print("Too many channels arguments given to set timeout, max channels is 4")
+            return RET_FAIL
+
+        if len(reqch) == 1:
+            self.required_channels[t_index] = reqch[0]
+        else:
+            for ch in reqch:
+                self.required_channels[t_index] |= ch
+
+        return RET_OK
+
+    #Set enabled channels to be used for grip
+    #Can be called with arbitrary channels
+    #Example1: vgp.set_grip(0, vgp.A_CH, vgp.B_CH) set A and B to grip
+    #Example2: vgp.set_grip(0, vgp.B_CH) set only B to grip
+    #Example3: vgp.set_grip(0, vgp.CH_ALL) set all channels
+    def set_grip(self, t_index, *enach):
+        '''
+        Sets the grip channels to be used for grip \n
+        Channel can be vgp.A_CH, vgp.B_CH, vgp.C_CH, vgp.D_CH, vgp.ALL_CH or combinations of those
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        '''
+        if len(enach) == 0:
+            print("No channel parameter given to set to grip")
+            return RET_FAIL
+
+        if len(enach) > 4:
+            print("Too many channels arguments given to set to grip, max channels is 4")
+            return RET_FAIL
+
+        if len(enach) == 1:
+            self.enabled_channels[t_index] = enach[0]
+        else:
+            for ch in enach:
+                self.enabled_channels[t_index] |= ch
+
+        return RET_OK
+
+    #Grip with the previously defined params
+    def grip(self, t_index=0, vac=20, f_wait=True):
+        '''
+        Starts a grip with the previously defined params\n
+        set_grip and set_timeout needs to be called before this
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @param vac: Vacuum level in kPa (5-60)
+        @type vac: int
+        @type f_wait: bool
+        @param f_wait: wait for the grip to end or not?
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        #Sanity check
+        if vac < 5 or vac > 60:
+            print("Invalid parameter for vacuum level")
+            return RET_FAIL
+
+        if self.enabled_channels[t_index] == 0:
+            print("Please set up channels with the set_grip command before calling grip")
+
+        self.cb.vgp_grip(t_index, int(self.enabled_channels[t_index]), int(self.required_channels[t_index]), int(vac))
+
+        if f_wait:
+            tim_cnt = 0
+            fbusy = self.isBusy(t_index)
+            while (fbusy):
+                if wait(0.1):
+                    break
+                fbusy = self.isBusy(t_index)
+                tim_cnt += 1
+                if tim_cnt > 30:
+                    print("VGP grip command timed out")
+                    break
+            else:
+                return RET_OK
+
+            #Grip timeout
+            return RET_FAIL
+        else:
+            return RET_OK
+
+    #Channels list can be arbitrary so it needs to be the last param
+    #Can be called with arbitrary channels
+    #Example1: vgp.release(0, True, vgp.A_CH, vgp.B_CH) set A and B to grip
+    #Example2: vgp.release(0, True,  vgp.B_CH) set only B to grip
+    #Example3: vgp.release(0, True,  vgp.CH_ALL) set all channels
+    def release(self, t_index, f_wait, *channels):
+        '''
+        Releases the vacuum on the given channels \n
+        Channel can be vgp.A_CH, vgp.B_CH, vgp.C_CH, vgp.D_CH, vgp.ALL_CH or combinations of those
+
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @type f_wait: bool
+        @param f_wait: wait for the release to end or not?
+        '''
+        if self.isConnected(t_index) is False:
+            return CONN_ERR
+
+        rel_channels = 0
+
+        if len(channels) == 0:
+            print("No channels parameter given to release command")
+            return RET_FAIL
+
+        if len(channels) > 4:
+            print("Too many channels arguments given to release command, max channels is 4")
+            return RET_FAIL
+
+        if len(channels) == 1:
+            rel_channels = channels[0]
+        else:
+            for ch in channels:
+                rel_channels |= ch
+
+        self.cb.vgp_release(t_index, int(rel_channels))
+
+        if f_wait:
+            tim_cnt = 0
+            fbusy = self.isBusy(t_index)
+            while (fbusy):
+                if wait(0.1):
+                    break
+                fbusy = self.isBusy(t_index)
+                tim_cnt += 1
+                if tim_cnt > 30:
+                    print("VGP release command timed out")
+                    break
+            else:
+                return RET_OK
+
+            #Release timeout
+            return RET_FAIL
+        else:
+            return RET_OK
+
+
+class LeakMonitor(Sampler):
+    '''
+    This class is for estimating the vacuum leak rate of the VGP channels\n
+    All four channel vacuum levels are sampled with one batched read per tick and a
+    least squares line is fitted per channel over a sliding window
+    '''
+
+    def __init__(self, dev, t_index=0, window=20, period=0.05):
+        '''
+        @param dev: Device object
+        @param t_index: The position of the device (0 for single, 1 for dual primary, 2 for dual secondary)
+        @type t_index: int
+        @param window: Number of samples kept in the sliding window
+        @type window: int
+        @param period: Sampling period in seconds for start()
+        @type period: float
+        '''
+        if window < 2:
+            raise ValueError("window needs at least 2 samples")
+
+        Sampler.__init__(self, period)
+        self.gripper = VGP(dev)
+        self.t_index = t_index
+
+        self._times = np.zeros(int(window))
+        self._vacuum = np.zeros((int(window), len(VGP_CHANNELS)))
+        self._head = 0
+        self._count = 0
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        '''
+        Clears the sliding window, call it right after VGP.grip has completed
+        '''
+        with self._lock:
+            self._head = 0
+            self._count = 0
+            self._t0 = time.perf_counter()
+
+    def sample(self):
+        '''
+        Reads the vacuum level of all four channels and adds it to the window
+
+        @rtype: numpy.ndarray
+        @return: Vacuum percentages in A, B, C, D order
+        '''
+        vac = self.gripper._read_channels(self.t_index, self.gripper.ALL_CH, (VGP_VACUUM_CALLS,))[0]
+        with self._lock:
+            self._times[self._head] = time.perf_counter() - self._t0
+            self._vacuum[self._head] = vac
+            self._head = (self._head + 1) % len(self._times)
+            self._count += 1
+        return vac
+
+    def fit(self):
+        '''
+        Fits vacuum = level + rate * t per channel over the window
+
+        @rtype: tuple
+        @return: (rate in %/s, fitted current level in %) arrays in A, B, C, D order,
+        None if the window holds less than 2 samples
+        '''
+        with self._lock:
+            n = min(self._count, len(self._times))
+            if n < 2:
+                return None
+            idx = (self._head - n + np.arange(n)) % len(self._times)
+            t = self._times[idx]
+            v = self._vacuum[idx]
+
+        dt = t - t.mean()
+        denom = np.dot(dt, dt)
+        if denom == 0.0:
+            return None
+        rate = np.dot(dt, v - v.mean(axis=0)) / denom
+        level = v.mean(axis=0) + rate * (t[-1] - t.mean())
+        return rate, level
+
+    def at_risk(self, release_in, min_vacuum, chmask=0x0F):
+        '''
+        Returns with the channels predicted to drop below min_vacuum before the release
+
+        @param release_in: Time until the planned release in seconds
+        @type release_in: float
+        @param min_vacuum: Lowest vacuum level in % that still holds the part
+        @type min_vacuum: float
+        @param chmask: Channels to check, vgp.ALL_CH or combination of vgp.A_CH, B_CH, C_CH, D_CH
+        @type chmask: int
+
+        @rtype: int
+        @return: Channel mask of the channels at risk, 0 if none
+        '''
+        est = self.fit()
+        if est is None:
+            return 0
+        rate, level = est
+        risk = (rate < 0) & (level + rate * release_in < min_vacuum)
+        mask = 0
+        for ch, r in zip(VGP_CHANNELS, risk):
+            if r and (chmask & ch):
+                mask |= ch
+        return mask
+
+    def start(self):
+        '''
+        Clears the window and samples in a background thread until stop() is called
+        '''
+        if self.isRunning():
+            return RET_FAIL
+        if self.gripper.isConnected(self.t_index) is False:
+            return CONN_ERR
+        self.reset()
+        self._start()
+        return RET_OK
+
+
+if __name__ == '__main__':
+    device = Device()
+    gripper_VGP = VGP(device)
+    print("Connection check: ", gripper_VGP.isConnected())
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+
+import csv
+import time
+import threading
+import xmlrpc.client
+from contextlib import contextmanager
+from device import Device
+
+'''
+XML-RPC library for controlling OnRobot devcies from Doosan robots
+
+Global_cbip holds the IP address of the compute box, needs to be defined by the end user
+'''
+
+# Connection
+CONN_ERR = -2   # Connection failure
+RET_OK = 0      # Okay
+RET_FAIL = -1   # Error
+
+#Columns of the section profiler statistics
+PROFILE_COLUMNS = ('section', 'count', 'mean', 'p95', 'max')
+
+
+class Weblytics():
+    '''
+    This class is for weblytics functionality
+    '''
+    cb = None
+
+    def __init__(self, dev):
+        self.WL_VAR_START_INDEX = 32768
+        self.WL_VAR_END_INDEX = 65535
+        self.WL_SECTION_INDEX = self.WL_VAR_START_INDEX
+        self.WL_EVENT_START_INDEX = 32778
+        self.WL_CYCLECNT_INDEX = 32868
+        self.WL_FAILED_CYCLECNT = 32869
+        self.WL_PROGRAMID = 32870
+        self.cb = dev.getCB()
+        #Init wl user variables to zero
+        self._clear()
+
+    def _clear(self):
+        '''
+        Zero the WL user variables
+        '''
+        self.cb.cb_set_weblytics_variables(int(self.WL_VAR_START_INDEX), int(self.WL_VAR_END_INDEX), 0)
+
+    def section_start(self, section_id):
+        '''
+        Send a checkpoint to weblytics
+        @param section_id: The ID of the section that we are entering for the weblytics (1-32767)
+        @type section_id: int
+        '''
+
+        #Sanity check
+        if section_id < 1 or section_id > 32767:
+            print("Invalid parameter for section value, 1-32767 is valid only")
+            return RET_FAIL
+
+        self.cb.cb_set_weblytics_variable(int(self.WL_SECTION_INDEX), int(section_id))
+
+    def section_stop(self, section_id):
+        '''
+        Send a checkpoint to weblytics
+        @param section_id: The ID of the section that we are entering for the weblytics (1-32767)
+        @type section_id: int
+        '''
+
+        #Sanity check
+        if section_id < 1 or section_id > 32767:
+            print("Invalid parameter for section value, 1-32767 is valid only")
+            return RET_FAIL
+
+        self.cb.cb_set_weblytics_variable(int(self.WL_SECTION_INDEX), int((-1)*section_id))
+
+    def event(self, event_index):
+        '''
+        Send an event to weblytics
+        Events are available from 1 to 10
+        @param event_index: The event to send to weblytics
+        @type event_index: int
+        @return: Event counter after incrementing
+        @rtype: int
+        '''
+
+        #Sanity check
+        if event_index < 1 or event_index > 10:
+            print("Invalid parameter for event index, 1-10 is valid only")
+            return RET_FAIL
+
+        wl_event_index = self.WL_EVENT_START_INDEX + event_index -1
+        retval = self.cb.cb_increment_weblytics_variable(int(wl_event_index), 1)
+        return retval
+
+    def get_event(self, event_index):
+        '''
+        Get current event value for given index
+        Events are available from 1 to 10
+        @param event_index: The event to send to weblytics
+        @type event_index: int
+        @return: Event counter after incrementing
+        @rtype: int
+        '''
+
+        #Sanity check
+        if event_index < 1 or event_index > 10:
+            print("Invalid parameter for event index, 1-10 is valid only")
+            return RET_FAIL
+
+        wl_event_index = self.WL_EVENT_START_INDEX + event_index -1
+        retval = self.cb.cb_increment_weblytics_variable(int(wl_event_index), 0)
+        return retval
+
+    def cyclecounter(self):
+        '''
+        Signal the weblytics that a cycle was done
+        @return: The incremented cycle counter value
+        @rtype: int
+        '''
+
+        retval =self.cb.cb_increment_weblytics_variable(self.WL_CYCLECNT_INDEX, 1)
+        return retval
+
+    def get_cyclecounter(self):
+        '''
+        Get back the current cycle counter value
+        @return: The current cycle counter value
+        @rtype: int
+        '''
+
+        retval = self.cb.cb_increment_weblytics_variable(self.WL_CYCLECNT_INDEX, 0)
+        return retval
+
+    def nonprodcycle(self):
+        '''
+        Signal the weblytics that a non productive cycle happened
+        @return: The incremented non productive cycle counter value
+        @rtype: int
+        '''
+
+        retval = self.cb.cb_increment_weblytics_variable(self.WL_FAILED_CYCLECNT, 1)
+        return retval
+
+    def get_nonprodcycle(self):
+        '''
+        Get back the current non productive cyle counter
+        @return: The current non productive cycle counter
+        @rtype: int
+        '''
+
+        retval = self.cb.cb_increment_weblytics_variable(self.WL_FAILED_CYCLECNT, 0)
+        return retval
+
+    def setprogramid(self, prog_id):
+        '''
+        Send our program ID to the weblytics
+        '''
+        #Sanity check
+        if prog_id < 1 or prog_id > 32767:
+            print("Invalid parameter for checkpoint value, 1-32767 is valid only")
+            return RET_FAIL
+
+        self.cb.cb_set_weblytics_variable(int(self.WL_PROGRAMID), int(prog_id))
+
+
+class WeblyticsSink(Weblytics):
+    '''
+    This class is a non-blocking drop-in for Weblytics, the updates are queued and sent
+    from a background thread in one batched round trip, in the order they were made\n
+    Repeated increments of a counter are coalesced into one increment by N as long as no
+    variable write comes in between, and flushed on the timer or at a cycle boundary
+    (cyclecounter, nonprodcycle). Section and program markers are flushed right away,
+    since Weblytics times them on arrival\n
+    A failed flush puts the updates back in front of the queue, the queue keeps the last
+    max_pending updates and the older ones are counted in dropped\n
+    The buffered methods return RET_OK instead of the counter value, the get_ methods
+    flush first and read the counters synchronously
+    '''
+
+    def __init__(self, dev, period=0.5, max_pending=1000):
+        '''
+        @param dev: Device object, the flushes use their own ComputeBox connection
+        @param period: Flush period in seconds
+        @type period: float
+        @param max_pending: Maximum number of queued updates
+        @type max_pending: int
+        '''
+        Weblytics.__init__(self, dev)
+        self.period = float(period)
+        self.max_pending = int(max_pending)
+        self.flushes = 0
+        #Updates lost to a full queue or a faulting call, failed flushes in a row and the last error
+        self.dropped = 0
+        self.failures = 0
+        self.last_error = None
+        self._flush_cb = dev.getCB()
+        #Updates in call order, as [method, index, value], value is the count of an increment
+        self._queue = []
+        #Pending increments since the last variable write per index, these are coalesced
+        self._open = {}
+        self._warned = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    #Private method, drops the oldest updates over max_pending, call it holding the lock
+    def _trim(self):
+        over = len(self._queue) - self.max_pending
+        if over > 0:
+            del self._queue[:over]
+            self.dropped += over
+            self._open = {}
+
+    #Private method, queues an update, call it holding the lock
+    def _queue_update(self, update):
+        self._queue.append(update)
+        self._trim()
+        if not self._warned and (self._thread is None or not self._thread.is_alive()):
+            self._warned = True
+            print("WeblyticsSink is not started, the updates are only sent on flush()")
+
+    def _set(self, index, value):
+        with self._lock:
+            self._open = {}
+            self._queue_update(['cb_set_weblytics_variable', int(index), int(value)])
+        self._wake.set()
+        return RET_OK
+
+    def _increment(self, index, boundary=False):
+        index = int(index)
+        with self._lock:
+            update = self._open.get(index)
+            if update is not None:
+                update[2] += 1
+            else:
+                update = ['cb_increment_weblytics_variable', index, 1]
+                self._open[index] = update
+                self._queue_update(update)
+        if boundary:
+            self._wake.set()
+        return RET_OK
+
+    def flush(self):
+        '''
+        Sends the queued updates in one batched round trip
+
+        @return: Number of XML-RPC calls sent, CONN_ERR if the batch could not be sent
+        @rtype: int
+        '''
+        with self._flush_lock:
+            with self._lock:
+                batch, self._queue = self._queue, []
+                self._open = {}
+            if not batch:
+                return 0
+            try:
+                multi = xmlrpc.client.MultiCall(self._flush_cb)
+                for method, index, value in batch:
+                    getattr(multi, method)(index, value)
+                res = multi()
+            except Exception as e:
+                #Nothing was applied, the batch goes back in front of what was queued meanwhile
+                self.last_error = e
+                if self.failures == 0:
+                    print("Weblytics flush failed: " + str(e))
+                self.failures += 1
+                with self._lock:
+                    self._queue = batch + self._queue
+                    self._trim()
+                return CONN_ERR
+
+            self.flushes += 1
+            self.failures = 0
+            for i, (method, index, value) in enumerate(batch):
+                try:
+                    res[i]
+                except xmlrpc.client.Fault as e:
+                    #A rejected update would be rejected again, so it is not retried
+                    self.dropped += 1
+                    self.last_error = e
+                    print("Weblytics update of " + str(index) + " failed: " + str(e.faultString))
+            return len(batch)
+
+    def section_start(self, section_id):
+        if section_id < 1 or section_id > 32767:
+            print("Invalid parameter for section value, 1-32767 is valid only")
+            return RET_FAIL
+
+        return self._set(self.WL_SECTION_INDEX, section_id)
+
+    def section_stop(self, section_id):
+        if section_id < 1 or section_id > 32767:
+            print("Invalid parameter for section value, 1-32767 is valid only")
+            return RET_FAIL
+
+        return self._set(self.WL_SECTION_INDEX, -section_id)
+
+    def setprogramid(self, prog_id):
+        if prog_id < 1 or prog_id > 32767:
+            print("Invalid parameter for checkpoint value, 1-32767 is valid only")
+            return RET_FAIL
+
+        return self._set(self.WL_PROGRAMID, prog_id)
+
+    def event(self, event_index):
+        if event_index < 1 or event_index > 10:
+            print("Invalid parameter for event index, 1-10 is valid only")
+            return RET_FAIL
+
+        return self._increment(self.WL_EVENT_START_INDEX + event_index - 1)
+
+    def cyclecounter(self):
+        return self._increment(self.WL_CYCLECNT_INDEX, True)
+
+    def nonprodcycle(self):
+        return self._increment(self.WL_FAILED_CYCLECNT, True)
+
+    def get_event(self, event_index):
+        self.flush()
+        return Weblytics.get_event(self, event_index)
+
+    def get_cyclecounter(self):
+        self.flush()
+        return Weblytics.get_cyclecounter(self)
+
+    def get_nonprodcycle(self):
+        self.flush()
+        return Weblytics.get_nonprodcycle(self)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.period)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        '''
+        Starts the flush thread
+        '''
+        if self._thread is not None and self._thread.is_alive():
+            return RET_FAIL
+        self._warned = False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return RET_OK
+
+    def stop(self):
+        '''
+        Stops the flush thread and sends what is still queued
+        '''
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+class _P2Quantile():
+    '''
+    Running quantile estimate in O(1) memory with the P-square algorithm of Jain and Chlamtac
+    '''
+
+    def __init__(self, p):
+        self.p = p
+        self.q = []
+        self.n = [0, 1, 2, 3, 4]
+        self.np = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self.dn = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        q, n = self.q, self.n
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        #Move the middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self):
+        if not self.q:
+            return float('nan')
+        if len(self.q) < 5:
+            return self.q[min(int(self.p * len(self.q)), len(self.q) - 1)]
+        return self.q[2]
+
+
+class SectionProfiler():
+    '''
+    This class times program sections locally with time.perf_counter() and keeps
+    count, mean, p95 and max per section ID in O(1) memory\n
+    If a Weblytics (or WeblyticsSink) object is given the section markers are forwarded to it,
+    outside of the measured time\n
+    Example:\n
+    with profiler.section(3):\n
+        pick()
+    '''
+
+    def __init__(self, weblytics=None):
+        '''
+        @param weblytics: Weblytics object to forward the section markers to, None to time locally only
+        '''
+        self.weblytics = weblytics
+        #Per section [count, mean, max, p95 estimator]
+        self._stats = {}
+        self._open = {}
+
+    def start(self, section_id):
+        '''
+        Enters a section
+        @param section_id: The ID of the section (1-32767)
+        @type section_id: int
+        '''
+        if section_id < 1 or section_id > 32767:
+            print("Invalid parameter for section value, 1-32767 is valid only")
+            return RET_FAIL
+
+        if self.weblytics is not None:
+            self.weblytics.section_start(section_id)
+        self._open[section_id] = time.perf_counter()
+        return RET_OK
+
+    def stop(self, section_id):
+        '''
+        Leaves a section and records its duration
+        @param section_id: The ID of the section (1-32767)
+        @type section_id: int
+        @return: Duration of the section in seconds, RET_FAIL if it was not started
+        @rtype: float
+        '''
+        end = time.perf_counter()
+        start = self._open.pop(section_id, None)
+        if start is None:
+            print("Section " + str(section_id) + " was not started")
+            return RET_FAIL
+        if self.weblytics is not None:
+            self.weblytics.section_stop(section_id)
+
+        duration = end - start
+        st = self._stats.get(section_id)
+        if st is None:
+            st = self._stats[section_id] = [0, 0.0, 0.0, _P2Quantile(0.95)]
+        st[0] += 1
+        st[1] += (duration - st[1]) / st[0]
+        st[2] = max(st[2], duration)
+        st[3].add(duration)
+        return duration
+
+    @contextmanager
+    def section(self, section_id):
+        '''
+        Context manager that times the enclosed block as the given section
+        @param section_id: The ID of the section (1-32767)
+        @type section_id: int
+        '''
+        started = self.start(section_id) == RET_OK
+        try:
+            yield
+        finally:
+            if started:
+                self.stop(section_id)
+
+    def stats(self):
+        '''
+        Returns with the statistics per section ID, each a dictionary indexed with
+        ['count', 'mean', 'p95', 'max'], times in seconds
+
+        @rtype: dict
+        '''
+        return {sid: {'count': st[0], 'mean': st[1], 'p95': st[3].value(), 'max': st[2]}
+                for sid, st in sorted(self._stats.items())}
+
+    def export(self, path):
+        '''
+        Writes the statistics into a CSV file, columns are PROFILE_COLUMNS
+
+        @param path: Path of the CSV file
+        @type path: str
+        '''
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(PROFILE_COLUMNS)
+            for sid, st in self.stats().items():
+                writer.writerow([sid] + [st[k] for k in PROFILE_COLUMNS[1:]])
+
+    def reset(self):
+        '''
+        Clears the statistics
+        '''
+        self._stats = {}
+        self._open = {}
+
+
+if __name__ == '__main__':
+    device = Device()
+    weblytics = Weblytics(device)
+    print("Cycle counter: ", weblytics.get_cyclecounter())
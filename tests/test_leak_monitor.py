@@ -0,0 +1,66 @@
+import numpy as np
+
+import vgp
+from vgp import LeakMonitor
+
+#Vacuum in % per channel at time t, A leaks, B holds, C still builds, D holds
+RATES = np.array([-2.0, 0.0, 1.0, 0.0])
+START = np.array([80.0, 60.0, 40.0, 0.0])
+
+
+class StubProxy():
+    '''
+    Stands in for the ComputeBox ServerProxy, returns the vacuum of the channels at the clock time
+    '''
+
+    def __init__(self, clock):
+        self.system = self
+        self.clock = clock
+
+    def multicall(self, calls):
+        vac = START + RATES * self.clock[0]
+        return [[float(vac[vgp.VGP_VACUUM_CALLS.index(c['methodName'])])] for c in calls]
+
+
+class StubDevice():
+    def __init__(self, clock):
+        self.clock = clock
+
+    def getCB(self):
+        return StubProxy(self.clock)
+
+
+def make_monitor(monkeypatch, window):
+    clock = [0.0]
+    monkeypatch.setattr(vgp.time, 'perf_counter', lambda: clock[0])
+    return LeakMonitor(StubDevice(clock), window=window), clock
+
+
+def test_fit_needs_two_samples(monkeypatch):
+    mon, clock = make_monitor(monkeypatch, 5)
+    assert mon.fit() is None
+    mon.sample()
+    assert mon.fit() is None
+
+
+def test_fit_over_wrapped_window(monkeypatch):
+    mon, clock = make_monitor(monkeypatch, 20)
+    #More samples than the window, the oldest ones are overwritten
+    for k in range(31):
+        clock[0] = 0.1 * k
+        mon.sample()
+    rate, level = mon.fit()
+    assert np.allclose(rate, RATES)
+    assert np.allclose(level, START + RATES * clock[0])
+
+
+def test_at_risk(monkeypatch):
+    mon, clock = make_monitor(monkeypatch, 20)
+    assert mon.at_risk(5.0, 70.0) == 0
+    for k in range(20):
+        clock[0] = 0.1 * k
+        mon.sample()
+    #A is at 76.2 % and loses 10 % until the release
+    assert mon.at_risk(5.0, 70.0) == vgp.VGP_CHANNELS[0]
+    assert mon.at_risk(5.0, 70.0, chmask=vgp.VGP_CHANNELS[1]) == 0
+    assert mon.at_risk(1.0, 70.0) == 0
@@ -0,0 +1,47 @@
+import itertools
+
+import numpy as np
+
+import pickorder
+
+
+def test_distance_matrix():
+    points = np.random.default_rng(1).uniform(-100, 100, (12, 3))
+    naive = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=2)
+    assert np.allclose(pickorder.distance_matrix(points), naive)
+
+
+def test_empty():
+    order, length = pickorder.pick_order(np.zeros((0, 6)), [0, 0, 0, 0, 0, 0])
+    assert len(order) == 0 and length == 0.0
+
+
+def test_collinear():
+    poses = np.zeros((3, 6))
+    poses[:, 0] = [30, 10, 20]
+    order, length = pickorder.pick_order(poses, [0, 0, 0, 0, 0, 0])
+    assert order.tolist() == [1, 2, 0]
+    assert np.isclose(length, 30.0)
+
+
+def test_order_is_permutation_with_reported_length():
+    poses = np.random.default_rng(2).uniform(0, 400, (40, 6))
+    start = [0, 0, 0, 0, 0, 0]
+    order, length = pickorder.pick_order(poses, start, budget=1.0)
+    assert sorted(order.tolist()) == list(range(len(poses)))
+
+    points = np.vstack((np.zeros(3), poses[order, :3]))
+    assert np.isclose(length, np.linalg.norm(np.diff(points, axis=0), axis=1).sum())
+
+
+def test_two_opt_between_nearest_neighbour_and_optimum():
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        poses = rng.uniform(0, 400, (7, 6))
+        points = np.vstack((np.zeros(3), poses[:, :3]))
+        dist = pickorder.distance_matrix(points)
+        greedy = pickorder.path_length(dist, pickorder._nearest_neighbour(dist))
+        best = min(pickorder.path_length(dist, (0,) + p) for p in itertools.permutations(range(1, 8)))
+
+        _, length = pickorder.pick_order(poses, [0, 0, 0, 0, 0, 0], budget=1.0)
+        assert best - 1e-9 <= length <= greedy + 1e-9
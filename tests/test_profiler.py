@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pytest
+
+from weblytics import _P2Quantile, SectionProfiler, RET_FAIL
+
+
+def test_p2_quantile_empty_and_few_samples():
+    q = _P2Quantile(0.5)
+    assert math.isnan(q.value())
+    for x in (3.0, 1.0, 2.0):
+        q.add(x)
+    assert q.value() == 2.0
+
+
+@pytest.mark.parametrize('p', [0.5, 0.95])
+@pytest.mark.parametrize('dist', ['uniform', 'normal', 'exponential'])
+def test_p2_quantile_tracks_percentile(p, dist):
+    rng = np.random.default_rng(4)
+    samples = getattr(rng, dist)(size=20000)
+    q = _P2Quantile(p)
+    for x in samples:
+        q.add(float(x))
+    exact = np.percentile(samples, 100 * p)
+    spread = np.percentile(samples, 99) - np.percentile(samples, 1)
+    assert abs(q.value() - exact) < 0.02 * spread
+
+
+def test_p2_quantile_sorted_input():
+    q = _P2Quantile(0.95)
+    for x in range(1000):
+        q.add(float(x))
+    assert abs(q.value() - 949.05) < 10
+
+
+def test_profiler_stats_and_forwarding():
+    class Recorder():
+        def __init__(self):
+            self.calls = []
+
+        def section_start(self, section_id):
+            self.calls.append(section_id)
+
+        def section_stop(self, section_id):
+            self.calls.append(-section_id)
+
+    rec = Recorder()
+    prof = SectionProfiler(rec)
+    for _ in range(3):
+        with prof.section(5):
+            pass
+    assert prof.stop(5) == RET_FAIL
+    assert prof.start(0) == RET_FAIL
+
+    st = prof.stats()[5]
+    assert st['count'] == 3
+    assert 0.0 <= st['mean'] <= st['max']
+    assert rec.calls == [5, -5] * 3
@@ -0,0 +1,58 @@
+import numpy as np
+
+import sdquality
+from sdquality import (SCREW_OK, SCREW_CROSS_THREAD, SCREW_STRIPPED, SCREW_SHORT, SCREW_NO_SCREW)
+from sd import SD_TRACE_COLUMNS
+
+TORQ = 1.0
+SCREW_LEN = 10.0
+
+
+#Builds a captured trace from torque and shank position samples
+def trace(torque, shank):
+    t = np.zeros((len(torque), len(SD_TRACE_COLUMNS)))
+    t[:, SD_TRACE_COLUMNS.index('time')] = np.arange(len(torque)) * 0.01
+    t[:, SD_TRACE_COLUMNS.index('torque')] = torque
+    t[:, SD_TRACE_COLUMNS.index('shank_pos')] = shank
+    return t
+
+
+#Low running torque, rising to the target at the end of the full travel
+def good_trace(n=50):
+    torque = np.full(n, 0.1)
+    torque[-5:] = np.linspace(0.3, TORQ, 5)
+    return trace(torque, np.linspace(0.0, SCREW_LEN, n))
+
+
+def test_classify_outcomes():
+    ok = good_trace()
+    no_screw = trace(np.full(50, 0.05), np.linspace(0.0, SCREW_LEN, 50))
+    stripped = good_trace()
+    stripped[-1, SD_TRACE_COLUMNS.index('torque')] = 0.3
+    not_reached = good_trace()
+    not_reached[:, SD_TRACE_COLUMNS.index('torque')] *= 0.6
+    short = good_trace()
+    short[:, SD_TRACE_COLUMNS.index('shank_pos')] *= 0.5
+    cross = good_trace()
+    cross[:25, SD_TRACE_COLUMNS.index('torque')] = 0.5
+
+    classes = sdquality.classify([ok, no_screw, stripped, not_reached, short, cross], TORQ, SCREW_LEN)
+    assert classes.tolist() == [SCREW_OK, SCREW_NO_SCREW, SCREW_STRIPPED, SCREW_STRIPPED,
+                                SCREW_SHORT, SCREW_CROSS_THREAD]
+
+
+def test_classify_different_lengths_and_empty_trace():
+    empty = np.zeros((0, len(SD_TRACE_COLUMNS)))
+    classes = sdquality.classify([good_trace(20), good_trace(80), empty], TORQ, SCREW_LEN)
+    assert classes.tolist() == [SCREW_OK, SCREW_OK, SCREW_NO_SCREW]
+
+
+def test_classify_per_trace_targets():
+    #The same trace falls short of a doubled target torque
+    classes = sdquality.classify([good_trace(), good_trace()], [TORQ, 2 * TORQ], SCREW_LEN)
+    assert classes.tolist() == [SCREW_OK, SCREW_STRIPPED]
+
+
+def test_summary():
+    counts = sdquality.summary(np.array([SCREW_OK, SCREW_OK, SCREW_SHORT]))
+    assert counts == {'OK': 2, 'cross-thread': 0, 'stripped': 0, 'short': 1, 'no screw': 0}
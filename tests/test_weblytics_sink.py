@@ -0,0 +1,126 @@
+import time
+
+from weblytics import WeblyticsSink, CONN_ERR
+
+SET = 'cb_set_weblytics_variable'
+INC = 'cb_increment_weblytics_variable'
+
+
+class StubProxy():
+    '''
+    Stands in for the ComputeBox ServerProxy, records the batches of system.multicall
+    '''
+
+    def __init__(self):
+        self.system = self
+        self.batches = []
+        self.down = False
+        #Variable indexes whose updates are rejected with a fault
+        self.rejected = set()
+
+    def multicall(self, calls):
+        if self.down:
+            raise ConnectionRefusedError("ComputeBox is down")
+        self.batches.append([(c['methodName'],) + tuple(c['params']) for c in calls])
+        return [{'faultCode': 1, 'faultString': "rejected"} if c['params'][0] in self.rejected else [0]
+                for c in calls]
+
+    def cb_set_weblytics_variables(self, start, end, value):
+        pass
+
+
+class StubDevice():
+    def __init__(self):
+        self.proxies = []
+
+    def getCB(self):
+        self.proxies.append(StubProxy())
+        return self.proxies[-1]
+
+
+def make_sink(**kwargs):
+    dev = StubDevice()
+    sink = WeblyticsSink(dev, **kwargs)
+    #The flushes use the second connection
+    return sink, dev.proxies[1]
+
+
+def test_updates_keep_call_order():
+    sink, cb = make_sink()
+    sink.section_start(4)
+    sink.event(1)
+    sink.event(1)
+    sink.section_stop(4)
+    sink.cyclecounter()
+    assert sink.flush() == 4
+    assert cb.batches == [[(SET, sink.WL_SECTION_INDEX, 4),
+                           (INC, sink.WL_EVENT_START_INDEX, 2),
+                           (SET, sink.WL_SECTION_INDEX, -4),
+                           (INC, sink.WL_CYCLECNT_INDEX, 1)]]
+
+
+def test_increments_not_coalesced_across_writes():
+    sink, cb = make_sink()
+    sink.event(2)
+    sink.section_start(1)
+    sink.event(2)
+    sink.flush()
+    index = sink.WL_EVENT_START_INDEX + 1
+    assert cb.batches == [[(INC, index, 1), (SET, sink.WL_SECTION_INDEX, 1), (INC, index, 1)]]
+
+
+def test_failed_flush_requeues_in_front():
+    sink, cb = make_sink()
+    cb.down = True
+    sink.section_start(1)
+    sink.event(1)
+    assert sink.flush() == CONN_ERR
+    assert sink.failures == 1
+
+    sink.section_stop(1)
+    cb.down = False
+    assert sink.flush() == 3
+    assert cb.batches == [[(SET, sink.WL_SECTION_INDEX, 1),
+                           (INC, sink.WL_EVENT_START_INDEX, 1),
+                           (SET, sink.WL_SECTION_INDEX, -1)]]
+    assert sink.failures == 0 and sink.dropped == 0
+
+
+def test_queue_is_bounded():
+    sink, cb = make_sink(max_pending=3)
+    cb.down = True
+    for section in range(1, 6):
+        sink.section_start(section)
+    sink.flush()
+    assert sink.dropped == 2
+
+    cb.down = False
+    sink.flush()
+    assert [call[2] for call in cb.batches[0]] == [3, 4, 5]
+
+
+def test_rejected_update_is_dropped_not_retried():
+    sink, cb = make_sink()
+    cb.rejected.add(sink.WL_PROGRAMID)
+    sink.setprogramid(7)
+    sink.event(1)
+    assert sink.flush() == 2
+    assert sink.dropped == 1
+    assert sink.flush() == 0
+
+
+def test_flush_thread_survives_failures(capsys):
+    sink, cb = make_sink(period=0.01)
+    sink.event(1)
+    assert "not started" in capsys.readouterr().out
+
+    cb.down = True
+    sink.start()
+    sink.cyclecounter()
+    time.sleep(0.05)
+    assert sink._thread.is_alive()
+
+    cb.down = False
+    time.sleep(0.05)
+    sink.stop()
+    assert cb.batches == [[(INC, sink.WL_EVENT_START_INDEX, 1), (INC, sink.WL_CYCLECNT_INDEX, 1)]]